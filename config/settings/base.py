@@ -67,6 +67,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 # MIDDLEWARE CONFIGURATION
 # ------------------------------------------------------------------------------
 MIDDLEWARE = [
+    'tango_with_django.rango.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -284,3 +285,101 @@ ADMIN_URL = r'^admin/'
 
 # Your common stuff: Below this line define 3rd party library settings
 # ------------------------------------------------------------------------------
+
+# RANGO
+# ------------------------------------------------------------------------------
+# Page clicks are buffered in the cache and written to the database in
+# batches at most this often (seconds). Set to 0 to only flush through the
+# flush_page_views management command.
+RANGO_PAGE_VIEW_FLUSH_INTERVAL = env.int('RANGO_PAGE_VIEW_FLUSH_INTERVAL', default=30)
+
+# Page id -> URL lookups for /rango/goto/ are cached per process for
+# RANGO_PAGE_URL_LOCAL_TIMEOUT seconds, in front of the shared cache.
+RANGO_PAGE_URL_CACHE_SIZE = env.int('RANGO_PAGE_URL_CACHE_SIZE', default=4096)
+RANGO_PAGE_URL_LOCAL_TIMEOUT = env.int('RANGO_PAGE_URL_LOCAL_TIMEOUT', default=30)
+RANGO_PAGE_URL_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Page search backend; by default chosen from the database engine
+# (PostgreSQL full-text search, SQLite FTS5, or plain icontains matching).
+RANGO_SEARCH_BACKEND = env('RANGO_SEARCH_BACKEND', default=None)
+RANGO_SEARCH_RESULTS_PER_PAGE = 20
+
+# Seconds before the in-memory category name index used for suggestions is
+# reloaded to pick up changed like counts.
+RANGO_SUGGESTION_INDEX_MAX_AGE = 300
+
+# The category sidebar lists this many categories (most liked first) and
+# is cached for RANGO_SIDEBAR_CACHE_TIMEOUT seconds or until a category changes
+# or a like reorders it.
+RANGO_SIDEBAR_CATEGORIES = 20
+RANGO_SIDEBAR_CACHE_TIMEOUT = 300
+
+# Home page leaderboards: how many categories/pages to show and how many
+# seconds the cached lists may be stale for.
+RANGO_LEADERBOARD_SIZE = 5
+RANGO_LEADERBOARD_TIMEOUT = 60
+
+# Webhose web search; the key falls back to the first line of search.key.
+WEBHOSE_API_KEY = env('WEBHOSE_API_KEY', default=None)
+RANGO_WEBHOSE_URL = env('RANGO_WEBHOSE_URL', default='http://webhose.io/filterWebContent')
+RANGO_WEBHOSE_TIMEOUT = 5
+RANGO_WEBHOSE_CACHE_TIMEOUT = 60 * 10
+# Run category page web searches on a pool of RANGO_SEARCH_WORKERS threads
+# and let the page poll for the results, instead of blocking the request.
+RANGO_ASYNC_SEARCH = env.bool('RANGO_ASYNC_SEARCH', default=True)
+RANGO_SEARCH_WORKERS = 4
+# A search still pending after this many seconds counts as lost, and a
+# failed one is reported for as long before it can be run again.
+RANGO_WEBHOSE_JOB_TIMEOUT = 30
+
+# Profiles per page of the profile list (keyset-paginated on user id).
+RANGO_PROFILES_PER_PAGE = 25
+
+# Profile pictures are resized to WebP/JPEG derivatives on a pool of
+# RANGO_IMAGE_WORKERS threads after upload (0 processes them inline).
+RANGO_IMAGE_WORKERS = env.int('RANGO_IMAGE_WORKERS', default=2)
+RANGO_IMAGE_QUALITY = 80
+
+# Pages listed per "Load more" step on category pages.
+RANGO_CATEGORY_PAGE_SIZE = 25
+
+# Most pages accepted by one bulk add of web search results.
+RANGO_ADD_PAGES_MAX = 100
+
+# Seconds browsers and proxies may reuse category suggestions.
+RANGO_SUGGEST_MAX_AGE = 60
+
+# Token-bucket limits on the AJAX endpoints (rango/ratelimit.py), shared
+# through Redis when it is the cache. RANGO_RATE_LIMITS maps URL names to
+# (requests per second, burst) to override the defaults in rango/urls.py.
+# Anonymous clients are told apart by REMOTE_ADDR, or by the last address
+# in RANGO_RATE_LIMIT_IP_HEADER (e.g. 'HTTP_X_FORWARDED_FOR') behind a proxy.
+RANGO_RATE_LIMIT_ENABLED = env.bool('RANGO_RATE_LIMIT_ENABLED', default=True)
+RANGO_RATE_LIMITS = {}
+RANGO_RATE_LIMIT_IP_HEADER = None
+
+# Results per page of the JSON API lists, unless ?limit= asks for up to
+# RANGO_API_MAX_PAGE_SIZE.
+RANGO_API_PAGE_SIZE = 100
+RANGO_API_MAX_PAGE_SIZE = 1000
+
+# Per-view request metrics (see rango/middleware.py): a sampled fraction of
+# requests gets a Server-Timing header and is added to the figures served
+# to staff, or with "Authorization: Bearer <RANGO_METRICS_TOKEN>", at
+# /rango/metrics/ in the Prometheus text format.
+RANGO_METRICS_ENABLED = env.bool('RANGO_METRICS_ENABLED', default=False)
+RANGO_METRICS_SAMPLE_RATE = env.float('RANGO_METRICS_SAMPLE_RATE', default=1.0)
+RANGO_METRICS_SERVER_TIMING = env.bool('RANGO_METRICS_SERVER_TIMING', default=True)
+RANGO_METRICS_TOKEN = env('RANGO_METRICS_TOKEN', default=None)
+
+# Identifies the deployed code in the ETags of rango pages (e.g. a git
+# commit), so a deploy that changes templates invalidates them. Without
+# it, each process uses its start time.
+RANGO_RELEASE = env('RANGO_RELEASE', default=None)
+
+# For SESSION_ENGINE = 'tango_with_django.contrib.sessions.write_behind'
+# (production): seconds between database writes of changed sessions (0
+# writes them inline), and seconds a worker may reuse a session it has read,
+# even after another worker changed or deleted it.
+SESSION_WRITE_BEHIND_INTERVAL = env.int('SESSION_WRITE_BEHIND_INTERVAL', default=5)
+SESSION_LOCAL_CACHE_TTL = env.float('SESSION_LOCAL_CACHE_TTL', default=1)
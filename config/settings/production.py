@@ -169,6 +169,13 @@ CACHES = {
     }
 }
 
+# Sessions live in Redis and are written to the database behind the
+# request; see tango_with_django/contrib/sessions/write_behind.py
+SESSION_ENGINE = 'tango_with_django.contrib.sessions.write_behind'
+
+# Heroku's router appends the client address to X-Forwarded-For
+RANGO_RATE_LIMIT_IP_HEADER = 'HTTP_X_FORWARDED_FOR'
+
 
 # Sentry Configuration
 SENTRY_DSN = env('DJANGO_SENTRY_DSN')
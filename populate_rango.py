@@ -5,7 +5,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE',
 import django
 django.setup()
 
-from tango_with_django.rango.models import Category, Page
+from tango_with_django.rango.loader import RangoLoader
+from tango_with_django.rango.models import Page
 
 def populate():
     # Lists of dictionaries containing pages to be
@@ -129,33 +130,20 @@ def populate():
                             "likes": 1024}
             }
 
-    # Iterate through the cats dictionary adding each category,
-    # and then add the pages associated to that category
+    # Load every category and its pages in bulk; safe to rerun
 
+    records = []
     for cat, cat_data in cats.items():
-        c = add_cat(cat, cat_data["views"], cat_data["likes"])
+        records.append({"name": cat, "views": cat_data["views"],
+                        "likes": cat_data["likes"]})
         for p in cat_data["pages"]:
-            add_page(c, p["title"], p["url"], p["views"])
+            records.append(dict(p, category=cat))
+    RangoLoader().load(records)
 
     # Print out the categories we have added
 
-    for c in Category.objects.all():
-        for p in Page.objects.filter(category=c):
-            print("- {0} - {1}".format(str(c), str(p)))
-
-def add_page(cat, title, url, views=0):
-    p = Page.objects.get_or_create(category=cat, title=title)[0]
-    p.url=url
-    p.views=views
-    p.save()
-    return p
-
-def add_cat(name, views=0, likes=0):
-    c = Category.objects.get_or_create(name=name)[0]
-    c.views=views
-    c.likes=likes
-    c.save()
-    return c
+    for p in Page.objects.select_related('category').order_by('category__name'):
+        print("- {0} - {1}".format(str(p.category), str(p)))
 
 if __name__ == '__main__':
     print("Starting Rango population script...")
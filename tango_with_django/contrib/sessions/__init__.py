@@ -0,0 +1,3 @@
+"""
+Session engines for the project; see write_behind.py.
+"""
@@ -0,0 +1,233 @@
+"""
+Cached sessions written to the database behind the request.
+
+Use with ``SESSION_ENGINE = 'tango_with_django.contrib.sessions.write_behind'``.
+Sessions are read from a short-lived copy in the worker process, then
+from the cache (SESSION_CACHE_ALIAS), then from the database.
+
+What must not be lost is written to the database straight away: new
+sessions (so a key clash is still detected, and cycle_key() is safe),
+changes to who is logged in, and deletions (logout). Other updates go to
+the cache at once and to the database at most every
+SESSION_WRITE_BEHIND_INTERVAL seconds, from a background thread; a
+worker that dies loses those it had not written yet, though they live
+on in the cache.
+
+A deletion leaves a marker in the cache, which save() checks, so a
+concurrent save() raises UpdateError as with Django's own engines rather
+than bring the session back. Reads do not check it: a session deleted or
+changed by another worker can still be read from the local copy for up
+to SESSION_LOCAL_CACHE_TTL seconds, so keep that to a second or so.
+"""
+import atexit
+import copy
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache import caches
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'tango_with_django.sessions.write_behind'
+# Deletion markers outlive local copies and the requests that were
+# running when their session was deleted
+DELETED_TIMEOUT = 60 * 60
+
+# Who is logged in; changes to these are written through
+AUTH_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+
+
+def auth_of(data):
+    return tuple(data.get(key) for key in AUTH_KEYS)
+
+
+class LocalSessionCache(object):
+    """Session data kept in process memory for a few seconds."""
+    max_entries = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'SESSION_LOCAL_CACHE_TTL', 1)
+
+    def get(self, session_key):
+        entry = self._entries.get(session_key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        # Callers modify the dict they get
+        return copy.deepcopy(entry[1])
+
+    def set(self, session_key, data):
+        ttl = self.ttl
+        if not ttl:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = dict((key, entry) for key, entry in self._entries.items()
+                                     if entry[0] >= now)
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[session_key] = (now + ttl, copy.deepcopy(data))
+
+    def discard(self, session_key):
+        with self._lock:
+            self._entries.pop(session_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SessionWriter(object):
+    """
+    Queues session updates and writes the latest version of each to the
+    database from a background thread, every SESSION_WRITE_BEHIND_INTERVAL
+    seconds (0 writes them inline). Whatever is queued at exit is written
+    then.
+
+    Only existing rows are updated: a session deleted meanwhile, here or
+    by another process, is not brought back, and its cached copy is
+    dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'SESSION_WRITE_BEHIND_INTERVAL', 5)
+
+    def enqueue(self, store_class, session_key, session_data, expire_date):
+        if not self.interval:
+            if not self._write(store_class, session_key, session_data, expire_date):
+                raise UpdateError
+            return
+        with self._lock:
+            self._pending[session_key] = (store_class, session_data, expire_date)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='session-writer')
+                self._thread.daemon = True
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def discard(self, session_key):
+        with self._lock:
+            self._pending.pop(session_key, None)
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Write all queued updates; return how many sessions were written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        written = 0
+        for session_key, (store_class, session_data, expire_date) in pending.items():
+            try:
+                written += self._write(store_class, session_key, session_data, expire_date)
+            except Exception:
+                logger.exception('Writing session %s failed', session_key[:8])
+                with self._lock:
+                    # Retry next time, unless a newer version is queued
+                    self._pending.setdefault(
+                        session_key, (store_class, session_data, expire_date))
+        return written
+
+    @staticmethod
+    def _write(store_class, session_key, session_data, expire_date):
+        written = store_class.get_model_class().objects.filter(session_key=session_key).update(
+            session_data=session_data, expire_date=expire_date)
+        if not written:
+            # Deleted since it was loaded: drop the copy save() cached too
+            caches[settings.SESSION_CACHE_ALIAS].delete(store_class.cache_key_prefix + session_key)
+            local_sessions.discard(session_key)
+        return written
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval or 1)
+            try:
+                self.flush()
+            finally:
+                # This thread outlives requests, so nothing else closes
+                # its database connection.
+                connection.close()
+
+
+local_sessions = LocalSessionCache()
+session_writer = SessionWriter()
+
+
+class SessionStore(CachedDBStore):
+    """
+    Django's cached_db engine with a local read cache in front and the
+    database updates written behind; see the module docstring.
+    """
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super(SessionStore, self).__init__(session_key)
+        # Who was logged in when the session was read, and whether this
+        # store inserted its row (create() or cycle_key())
+        self._loaded_auth = auth_of({})
+        self._created = False
+
+    def deleted_key(self, session_key):
+        return '{}.deleted:{}'.format(KEY_PREFIX, session_key)
+
+    def is_deleted(self, session_key):
+        return self._cache.get(self.deleted_key(session_key)) is not None
+
+    def load(self):
+        data = None
+        if self.session_key is not None:
+            data = local_sessions.get(self.session_key)
+        if data is None:
+            data = super(SessionStore, self).load()
+            if self.session_key is not None:
+                local_sessions.set(self.session_key, data)
+        self._loaded_auth = auth_of(data)
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if must_create:
+            # Inserted now, so that a clashing key raises CreateError
+            super(SessionStore, self).save(must_create=True)
+            self._created = True
+        elif self.is_deleted(self.session_key):
+            # Logged out by a concurrent request
+            raise UpdateError
+        elif self._created or auth_of(self._get_session()) != self._loaded_auth:
+            # A login, or the data carried over by cycle_key()
+            session_writer.discard(self.session_key)
+            super(SessionStore, self).save()
+        else:
+            data = self._get_session()
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
+            session_writer.enqueue(type(self), self.session_key, self.encode(data),
+                                   self.get_expiry_date())
+        local_sessions.set(self.session_key, self._session)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        if session_key is not None:
+            session_writer.discard(session_key)
+            local_sessions.discard(session_key)
+            self._cache.set(self.deleted_key(session_key), True, DELETED_TIMEOUT)
+        super(SessionStore, self).delete(session_key)
@@ -1,11 +1,42 @@
+from django.conf.urls import url
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
 
+from .export import CONTENT_TYPES, export
 from .models import Category, Page, UserProfile
 
 
 class CategoryAdmin(admin.ModelAdmin):
     
     prepopulated_fields = {'slug':('name',)}
+
+    def get_urls(self):
+        urls = [
+            url(r'^export/$', self.admin_site.admin_view(self.export_view),
+                name='rango_export'),
+        ]
+        return urls + super(CategoryAdmin, self).get_urls()
+
+    def export_view(self, request):
+        """
+        Stream all categories and pages for download:
+        ``?format=jsonl|csv`` and ``&gzip=1``; see export.py.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        fmt = request.GET.get('format', 'jsonl')
+        if fmt not in CONTENT_TYPES:
+            raise Http404('Unknown export format')
+        compress = request.GET.get('gzip') == '1'
+        filename = 'rango-{:%Y%m%d-%H%M%S}.{}{}'.format(
+            timezone.now(), fmt, '.gz' if compress else '')
+        response = StreamingHttpResponse(
+            export(fmt, compress),
+            content_type='application/gzip' if compress else CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+        return response
     
 
 class PageAdmin(admin.ModelAdmin):
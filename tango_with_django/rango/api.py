@@ -0,0 +1,166 @@
+"""
+A read-only JSON API over rango's categories and pages.
+
+Lists are keyset-paginated (see pagination.py): they return
+``{"results": [...], "next": cursor}``, and ``?after=<cursor>`` fetches
+the following rows. ``?fields=a,b`` selects the fields of each result
+and ``?limit=`` the page size, up to RANGO_API_MAX_PAGE_SIZE. Rows are
+read with ``values()`` and streamed to the client as they are encoded.
+"""
+import functools
+import itertools
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+
+from tango_with_django.rango.leaderboards import category_leaderboard, page_leaderboard
+from tango_with_django.rango.models import Category, Page
+from tango_with_django.rango.pagination import encode_cursor, seek
+from tango_with_django.rango.suggestions import category_index
+
+CATEGORY_FIELDS = ('id', 'name', 'slug', 'views', 'likes')
+PAGE_FIELDS = ('id', 'category_id', 'title', 'url', 'views', 'first_visit', 'last_visit')
+
+# Results per chunk of a streamed response
+CHUNK_SIZE = 100
+
+encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+class ApiError(Exception):
+
+    def __init__(self, message, status=400):
+        super(ApiError, self).__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    """Answer ApiErrors raised by ``view`` with a JSON error object."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+    return wrapper
+
+
+def get_fields(request, allowed):
+    """The fields named by ``?fields=``, in that order; all of them by default."""
+    names = [name for name in request.GET.get('fields', '').split(',') if name]
+    if not names:
+        return allowed
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ApiError('Unknown fields: {}. Choose from: {}'.format(
+            ', '.join(unknown), ', '.join(allowed)))
+    return tuple(sorted(set(names), key=names.index))
+
+
+def get_limit(request):
+    default = getattr(settings, 'RANGO_API_PAGE_SIZE', 100)
+    maximum = getattr(settings, 'RANGO_API_MAX_PAGE_SIZE', 1000)
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        raise ApiError('limit must be a number')
+    if not 0 < limit <= maximum:
+        raise ApiError('limit must be between 1 and {}'.format(maximum))
+    return limit
+
+
+def stream_page(request, queryset, order, allowed):
+    """
+    Stream one keyset page of ``queryset`` as JSON. The ``order`` fields
+    are read along with the selected ones, to build the next cursor.
+    """
+    fields = get_fields(request, allowed)
+    limit = get_limit(request)
+    columns = fields + tuple(name.lstrip('-') for name in order
+                             if name.lstrip('-') not in fields)
+    try:
+        rows = seek(queryset, order, request.GET.get('after'))
+    except ValueError:
+        raise ApiError('Bad cursor')
+    rows = rows.values(*columns)[:limit + 1].iterator()
+    # Run the query before the response starts, so that a failure is an
+    # error response rather than a 200 cut short
+    first = next(rows, None)
+    rows = itertools.chain([first], rows) if first is not None else iter(())
+
+    def chunks():
+        yield '{"results":['
+        chunk = []
+        last = None
+        next_cursor = None
+        separator = ''
+        for count, row in enumerate(rows):
+            if count == limit:
+                next_cursor = encode_cursor(last, order)
+                break
+            chunk.append(encoder.encode(dict((name, row[name]) for name in fields)))
+            last = row
+            if len(chunk) == CHUNK_SIZE:
+                yield separator + ','.join(chunk)
+                chunk = []
+                separator = ','
+        if chunk:
+            yield separator + ','.join(chunk)
+        yield '],"next":{}}}'.format(encoder.encode(next_cursor))
+
+    return StreamingHttpResponse(chunks(), content_type='application/json')
+
+
+def project(entries, fields):
+    """Results of ``fields`` from model instances or namedtuples."""
+    return [dict((name, getattr(entry, name)) for name in fields) for entry in entries]
+
+
+def json_response(data):
+    return JsonResponse(data, encoder=DjangoJSONEncoder)
+
+
+@api_view
+def categories(request):
+    """All categories, by id."""
+    return stream_page(request, Category.objects.all(), ('id',), CATEGORY_FIELDS)
+
+
+@api_view
+def pages(request):
+    """All pages, by id."""
+    return stream_page(request, Page.objects.all(), ('id',), PAGE_FIELDS)
+
+
+@api_view
+def category_pages(request, category_name_slug):
+    """The pages of a category, most viewed first."""
+    category_id = Category.objects.filter(slug=category_name_slug).values_list(
+        'id', flat=True).first()
+    if category_id is None:
+        raise ApiError('Category does not exist', status=404)
+    return stream_page(request, Page.objects.filter(category_id=category_id),
+                       ('-views', 'id'), PAGE_FIELDS)
+
+
+@api_view
+def top_categories(request):
+    """The most liked categories, from the leaderboard cache."""
+    fields = get_fields(request, CATEGORY_FIELDS)
+    return json_response({'results': project(category_leaderboard.top(), fields)})
+
+
+@api_view
+def top_pages(request):
+    """The most viewed pages, from the leaderboard cache."""
+    fields = get_fields(request, PAGE_FIELDS)
+    return json_response({'results': project(page_leaderboard.top(), fields)})
+
+
+@api_view
+def suggest_categories(request):
+    """Categories whose name starts with ``?prefix=``, most liked first."""
+    fields = get_fields(request, ('id', 'name', 'slug', 'likes'))
+    suggestions = category_index.suggest(request.GET.get('prefix', ''), 8)
+    return json_response({'results': project(suggestions, fields)})
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RangoConfig(AppConfig):
     name = 'tango_with_django.rango'
+
+    def ready(self):
+        # Connect cache invalidation signal handlers
+        from tango_with_django.rango import signals  # noqa
@@ -0,0 +1,57 @@
+"""
+Benchmarks for the rango views. They are not collected by a plain
+``py.test`` run (see norecursedirs in pytest.ini); run them with::
+
+    $ py.test tango_with_django/rango/benchmarks --bench-size=100k
+
+and record a new baseline after an intended change with ``--bench-save``.
+"""
+import json
+import os
+
+import pytest
+
+from tango_with_django.rango.benchmarks.data import SIZES, seed
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('rango benchmarks')
+    group.addoption('--bench-size', choices=sorted(SIZES), default='1k',
+                    help='Number of synthetic pages to seed.')
+    group.addoption('--bench-repeat', type=int, default=100,
+                    help='Timed requests per view.')
+    group.addoption('--bench-tolerance', type=float, default=0.5,
+                    help='Allowed latency/memory growth over the baseline, '
+                         'as a fraction.')
+    group.addoption('--bench-baseline', default=BASELINE,
+                    help='Baseline JSON file.')
+    group.addoption('--bench-save', action='store_true',
+                    help='Write the results to the baseline file instead '
+                         'of comparing against it.')
+
+
+@pytest.fixture(scope='session')
+def bench_data(request, django_db_setup, django_db_blocker):
+    # Seeded once per session, outside the per-test transactions
+    with django_db_blocker.unblock():
+        return seed(SIZES[request.config.getoption('--bench-size')])
+
+
+@pytest.fixture(scope='session')
+def bench_baseline(request):
+    path = request.config.getoption('--bench-baseline')
+    size = request.config.getoption('--bench-size')
+    baselines = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            baselines = json.load(f)
+    results = {}
+    yield baselines.get(size, {}), results
+
+    if request.config.getoption('--bench-save') and results:
+        baselines.setdefault(size, {}).update(results)
+        with open(path, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
@@ -0,0 +1,46 @@
+import random
+
+from tango_with_django.rango.loader import RangoLoader
+from tango_with_django.rango.models import Category, Page, UserProfile
+from tango_with_django.users.models import User
+
+# --bench-size name -> number of pages
+SIZES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+PAGES_PER_CATEGORY = 100
+PASSWORD = 'benchmark'
+
+
+def records(pages, seed=42):
+    """Synthetic categories and pages for ``load_rango``'s loader."""
+    rng = random.Random(seed)
+    categories = max(pages // PAGES_PER_CATEGORY, 1)
+    for c in range(categories):
+        name = 'Category {}'.format(c)
+        yield {'name': name, 'views': rng.randint(0, 10000),
+               'likes': rng.randint(0, 1000)}
+        for p in range(c, pages, categories):
+            yield {'category': name, 'title': 'Python page {}'.format(p),
+                   'url': 'http://example.com/{}/'.format(p),
+                   'views': rng.randint(0, 10000)}
+
+
+def seed(pages):
+    """
+    Load ``pages`` pages in ``pages / 100`` categories plus a staff user
+    with a profile, and return what the benchmarks need to build their URLs.
+    """
+    RangoLoader().load(records(pages))
+    # Staff, to also reach the metrics endpoint
+    user = User.objects.create_user('bench', password=PASSWORD, is_staff=True)
+    UserProfile.objects.create(user=user, website='http://example.com/')
+    category = Category.objects.order_by('-likes', 'name').first()
+    return {
+        'user': user,
+        'category': category,
+        'page': Page.objects.filter(category=category).order_by('-views', 'id').first(),
+    }
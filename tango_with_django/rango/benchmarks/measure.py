@@ -0,0 +1,95 @@
+import gc
+import json
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Absolute headroom on top of the relative tolerance, so that views which
+# take a millisecond or two do not fail on timer noise.
+SLACK = {
+    'p50_ms': 2.0,
+    'p99_ms': 5.0,
+    'peak_kb': 64.0,
+}
+
+
+def percentile(samples, percent):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))]
+
+
+def measure(client, path, params=None, body=None, repeat=100):
+    """
+    Request ``path`` with the test client and return the steady-state
+    query count, p50/p99 latency in milliseconds and the peak memory
+    allocated while handling one request, in KiB. A warm-up request fills
+    the caches first. With a ``body`` the requests are JSON POSTs.
+    """
+    if body is None:
+        def request():
+            return client.get(path, params)
+    else:
+        body = json.dumps(body)
+
+        def request():
+            return client.post(path, body, content_type='application/json')
+
+    def send():
+        response = request()
+        if response.streaming:
+            # Streamed responses do their work as they are read
+            b''.join(response.streaming_content)
+        return response
+
+    response = send()
+    assert response.status_code < 400, (path, response.status_code)
+
+    with CaptureQueriesContext(connection) as queries:
+        send()
+    # Count now: later requests reset the connection's query log
+    query_count = len(queries)
+
+    # As timeit does, keep garbage collection pauses out of the timings
+    samples = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            send()
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        send()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'queries': query_count,
+        'p50_ms': round(percentile(samples, 50), 2),
+        'p99_ms': round(percentile(samples, 99), 2),
+        'peak_kb': round(peak / 1024.0, 1),
+    }
+
+
+def regressions(result, baseline, tolerance):
+    """
+    Describe how ``result`` is worse than ``baseline``: any extra query,
+    or latency/memory more than ``tolerance`` (a fraction) above it.
+    """
+    problems = []
+    if result['queries'] > baseline['queries']:
+        problems.append('{} queries, baseline {}'.format(
+            result['queries'], baseline['queries']))
+    for key, slack in sorted(SLACK.items()):
+        allowed = baseline[key] * (1 + tolerance) + slack
+        if result[key] > allowed:
+            problems.append('{} {}, baseline {} (allowed {:.1f})'.format(
+                key, result[key], baseline[key], allowed))
+    return problems
@@ -0,0 +1,63 @@
+"""
+Session engines on a stream of requests by logged in users, one in
+WRITE_EVERY of which changes its session: time and database queries per
+request. Run with the view benchmarks, or on its own::
+
+    $ py.test tango_with_django/rango/benchmarks/test_sessions.py -s
+"""
+import time
+from importlib import import_module
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tango_with_django.contrib.sessions.write_behind import local_sessions, session_writer
+
+ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+    'tango_with_django.contrib.sessions.write_behind',
+)
+SESSIONS = 100
+REQUESTS = 5000
+WRITE_EVERY = 10
+
+
+def run(engine):
+    """Return the seconds and the queries ``engine`` took for REQUESTS requests."""
+    store_class = import_module(engine).SessionStore
+    keys = []
+    for i in range(SESSIONS):
+        store = store_class()
+        store.update({'_auth_user_id': str(i), 'visits': 0})
+        store.create()
+        keys.append(store.session_key)
+    local_sessions.clear()
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for i in range(REQUESTS):
+            # What SessionMiddleware and AuthenticationMiddleware do
+            store = store_class(keys[i % SESSIONS])
+            store.get('_auth_user_id')
+            if i % WRITE_EVERY == 0:
+                store['visits'] += 1
+                store.save()
+        session_writer.flush()
+        elapsed = time.perf_counter() - start
+
+    for key in keys:
+        store_class(key).delete()
+    return elapsed, len(queries)
+
+
+def test_session_engines(db, settings):
+    # Queued writes are flushed inside the measurement, rather than by
+    # the background thread
+    settings.SESSION_WRITE_BEHIND_INTERVAL = 60 * 60
+    queries = {}
+    for engine in ENGINES:
+        elapsed, queries[engine] = run(engine)
+        print('{:<50} {:8.3f} ms/request {:7.3f} queries/request'.format(
+            engine, elapsed * 1000 / REQUESTS, queries[engine] / float(REQUESTS)))
+    assert queries[ENGINES[2]] < queries[ENGINES[1]] < queries[ENGINES[0]]
@@ -0,0 +1,87 @@
+import pytest
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+
+from tango_with_django.rango import urls
+from tango_with_django.rango.benchmarks.data import PASSWORD
+from tango_with_django.rango.benchmarks.measure import measure, regressions
+from tango_with_django.rango.webhose_client import webhose_client
+
+
+def search_results_url(data):
+    token = webhose_client.make_token('python', 8)
+    cache.set(webhose_client.make_key(token), [], None)
+    # Cached, so this only records the job
+    job_id = webhose_client.submit('python')
+    return (reverse('rango:search_results', args=[job_id]),
+            {'category_id': data['category'].id})
+
+
+# URL name -> function of the seeded data returning (path, GET params),
+# or (path, GET params, JSON body) for a POST
+REQUESTS = {
+    'index': lambda d: (reverse('rango:index'), {}),
+    'about': lambda d: (reverse('rango:about'), {}),
+    'add_category': lambda d: (reverse('rango:add_category'), {}),
+    'show_category': lambda d: (
+        reverse('rango:show_category', args=[d['category'].slug]), {}),
+    'category_pages': lambda d: (
+        reverse('rango:category_pages', args=[d['category'].slug]),
+        {'after': '{}.{}'.format(d['page'].views, d['page'].id)}),
+    # Steady state: every page is already in the category
+    'add_pages': lambda d: (
+        reverse('rango:add_pages', args=[d['category'].slug]), {},
+        {'pages': [{'title': 'Benchmark {}'.format(i),
+                    'url': 'http://example.com/benchmark/{}/'.format(i)}
+                   for i in range(20)]}),
+    'add_page': lambda d: (
+        reverse('rango:add_page', args=[d['category'].slug]), {}),
+    'restricted': lambda d: (reverse('rango:restricted'), {}),
+    'search': lambda d: (reverse('rango:search'), {'query': 'python page'}),
+    'goto': lambda d: (reverse('rango:goto'), {'page_id': d['page'].id}),
+    'register_profile': lambda d: (reverse('rango:register_profile'), {}),
+    'profile': lambda d: (
+        reverse('rango:profile', args=[d['user'].username]), {}),
+    'list_profiles': lambda d: (reverse('rango:list_profiles'), {}),
+    'like_category': lambda d: (
+        reverse('rango:like_category'), {'category_id': d['category'].id}),
+    'suggest_category': lambda d: (
+        reverse('rango:suggest_category'), {'suggestion': 'cat'}),
+    'auto_add_page': lambda d: (
+        reverse('rango:auto_add_page'),
+        {'category_id': d['category'].id, 'title': 'Benchmark',
+         'url': 'http://example.com/benchmark/'}),
+    'search_results': search_results_url,
+    'metrics': lambda d: (reverse('rango:metrics'), {}),
+    'api_categories': lambda d: (reverse('rango:api_categories'), {}),
+    'api_category_pages': lambda d: (
+        reverse('rango:api_category_pages', args=[d['category'].slug]),
+        {'fields': 'id,title,url,views'}),
+    'api_pages': lambda d: (
+        reverse('rango:api_pages'),
+        {'after': d['page'].id, 'limit': 1000, 'fields': 'id,url'}),
+    'api_top_categories': lambda d: (reverse('rango:api_top_categories'), {}),
+    'api_top_pages': lambda d: (reverse('rango:api_top_pages'), {}),
+    'api_suggest_categories': lambda d: (
+        reverse('rango:api_suggest_categories'), {'prefix': 'cat'}),
+}
+
+
+def test_every_url_is_benchmarked():
+    names = set(pattern.name for pattern in urls.urlpatterns)
+    assert names == set(REQUESTS)
+
+
+@pytest.mark.parametrize('name', sorted(REQUESTS))
+def test_view(name, db, client, bench_data, bench_baseline, request):
+    baseline, results = bench_baseline
+    client.login(username=bench_data['user'].username, password=PASSWORD)
+    result = measure(client, *REQUESTS[name](bench_data),
+                     repeat=request.config.getoption('--bench-repeat'))
+    results[name] = result
+    print('{}: {}'.format(name, result))
+
+    if name in baseline and not request.config.getoption('--bench-save'):
+        problems = regressions(result, baseline[name],
+                               request.config.getoption('--bench-tolerance'))
+        assert not problems, '{} regressed: {}'.format(name, '; '.join(problems))
@@ -0,0 +1,64 @@
+import functools
+from collections import OrderedDict
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from tango_with_django.rango.category_cache import category_page_cache
+from tango_with_django.rango.leaderboards import page_leaderboard
+from tango_with_django.rango.models import Page
+from tango_with_django.rango.page_urls import page_url_cache
+
+
+def bulk_add_pages(category, items):
+    """
+    Add the ``(title, url)`` items to the category, skipping URLs it
+    already has, and return the new Pages in the order given.
+
+    One query finds the existing URLs (on the unique (url, category)
+    index) and one multi-row INSERT adds the rest. bulk_create() sends no
+    post_save signals, so the caches their handlers (signals.py) would
+    clear are cleared here, in the same way: once the transaction commits.
+    """
+    wanted = OrderedDict()
+    for title, url in items:
+        wanted.setdefault(url, title)
+    if not wanted:
+        return []
+
+    # A concurrent add of the same URL makes the INSERT fail; the retry
+    # then finds it among the existing pages.
+    for attempt in range(2):
+        existing = set(Page.objects.filter(category=category, url__in=list(wanted))
+                       .values_list('url', flat=True))
+        now = timezone.now()
+        new = [Page(category=category, title=title, url=url,
+                    first_visit=now, last_visit=now)
+               for url, title in wanted.items() if url not in existing]
+        if not new:
+            return []
+        try:
+            with transaction.atomic():
+                Page.objects.bulk_create(new)
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+
+    if new[0].pk is None:
+        # Only PostgreSQL returns the ids of rows bulk_create() inserts
+        ids = dict(Page.objects.filter(category=category, url__in=[p.url for p in new])
+                   .values_list('url', 'id'))
+        for page in new:
+            page.pk = ids[page.url]
+    # An id may have been used by a deleted page, and be cached as missing
+    transaction.on_commit(functools.partial(
+        invalidate_pages, category.pk, [page.pk for page in new]))
+    return new
+
+
+def invalidate_pages(category_id, page_ids):
+    for page_id in page_ids:
+        page_url_cache.invalidate(page_id)
+    category_page_cache.invalidate(category_id)
+    page_leaderboard.invalidate()
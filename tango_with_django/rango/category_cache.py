@@ -0,0 +1,99 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from tango_with_django.rango.models import Category, Page
+from tango_with_django.rango.pagination import keyset_page, keyset_query
+from tango_with_django.rango.versions import bump_version, get_version
+
+# The cached part of a category page: the Category and its rendered
+# page list (rango/page_list.html)
+CategoryPage = namedtuple('CategoryPage', 'category pages_html')
+
+
+def _category_pages_args(category, after):
+    return (Page.objects.filter(category=category), ('-views', 'id'),
+            getattr(settings, 'RANGO_CATEGORY_PAGE_SIZE', 25), after)
+
+
+def get_category_pages(category, after=None):
+    """One page of the category's pages, most viewed first; see pagination.py."""
+    return keyset_page(*_category_pages_args(category, after))
+
+
+def get_category_pages_query(category, after=None):
+    """The query ``get_category_pages`` runs."""
+    return keyset_query(*_category_pages_args(category, after))
+
+
+class CategoryPageCache(object):
+    """
+    Caches the shared part of category pages by slug. Per-user parts (the
+    like button, the search form and its CSRF token) are rendered around
+    it on every request.
+
+    Keys embed the ``categories`` version, bumped whenever any category is
+    saved or deleted (renames included), and a version per category,
+    bumped when one of its pages is saved or deleted, it is liked, or its
+    page views are flushed.
+    """
+    key_prefix = 'rango:category-page'
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'RANGO_CATEGORY_CACHE_TIMEOUT', 60 * 60)
+
+    @staticmethod
+    def version_name(category_id):
+        return 'category:{}'.format(category_id)
+
+    def resolve(self, slug):
+        """Return the ``categories`` version and the id of the category (0 if none)."""
+        categories = get_version('categories')
+        slug_key = '{}:slug:{}:{}'.format(self.key_prefix, categories, slug)
+        category_id = cache.get(slug_key)
+        if category_id is None:
+            # 0 for slugs that do not exist
+            category_id = Category.objects.filter(slug=slug).values_list(
+                'id', flat=True).first() or 0
+            cache.set(slug_key, category_id, self.timeout)
+        return categories, category_id
+
+    def stamp(self, slug):
+        """Version numbers that change whenever ``get(slug)`` would."""
+        categories, category_id = self.resolve(slug)
+        if not category_id:
+            return categories, 0, None
+        return categories, category_id, get_version(self.version_name(category_id))
+
+    def get(self, slug):
+        """Return the CategoryPage for ``slug``, or None if there is no such category."""
+        categories, category_id = self.resolve(slug)
+        if not category_id:
+            return None
+
+        # Read the version before the data, so a change made meanwhile
+        # leaves the entry under a version nobody asks for again.
+        key = '{}:{}:{}:{}'.format(self.key_prefix, category_id, categories,
+                                   get_version(self.version_name(category_id)))
+        entry = cache.get(key)
+        if entry is None:
+            category = Category.objects.filter(id=category_id).first()
+            if category is None:
+                return None
+            pages, next_cursor = get_category_pages(category)
+            html = render_to_string('rango/page_list.html', {
+                'category': category, 'pages': pages, 'next_cursor': next_cursor})
+            entry = CategoryPage(category, html)
+            cache.set(key, entry, self.timeout)
+        return entry._replace(pages_html=mark_safe(entry.pages_html))
+
+    def invalidate(self, *category_ids):
+        for category_id in category_ids:
+            bump_version(self.version_name(category_id))
+
+
+category_page_cache = CategoryPageCache()
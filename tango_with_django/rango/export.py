@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import zlib
+
+from tango_with_django.rango.models import Category, Page
+from tango_with_django.rango.pagination import seek
+
+CSV_COLUMNS = ('category', 'category_views', 'category_likes', 'title', 'url', 'views')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def chunked_rows(queryset, fields, chunk_size):
+    """
+    ``values_list(*fields)`` rows of ``queryset``, read ``chunk_size`` at a
+    time by id. ``fields`` must start with ``id``. Each chunk is a keyset
+    query read with iterator(), so memory stays flat however big the
+    table, and no transaction is held open between chunks.
+    """
+    after = None
+    while True:
+        count = 0
+        for row in seek(queryset, ('id',), after).values_list(*fields)[:chunk_size].iterator():
+            count += 1
+            yield row
+        if count < chunk_size:
+            return
+        after = str(row[0])
+
+
+def records(chunk_size=2000):
+    """
+    Every category, then every page, as records in the format load_rango
+    reads, so an export can be loaded back.
+    """
+    for _, name, views, likes in chunked_rows(
+            Category.objects.all(), ('id', 'name', 'views', 'likes'), chunk_size):
+        yield {'name': name, 'views': views, 'likes': likes}
+    for _, category, title, url, views in chunked_rows(
+            Page.objects.all(), ('id', 'category__name', 'title', 'url', 'views'), chunk_size):
+        yield {'category': category, 'title': title, 'url': url, 'views': views}
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record) + '\n'
+
+
+def csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for record in records:
+        if 'url' in record:
+            writer.writerow((record['category'], '', '', record['title'],
+                             record['url'], record['views']))
+        else:
+            writer.writerow((record['name'], record['views'], record['likes'], '', '', ''))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+WRITERS = {
+    'jsonl': jsonl_lines,
+    'csv': csv_lines,
+}
+
+
+def export(fmt, compress=False, chunk_size=2000, block_size=64 * 1024):
+    """
+    Yield the export as blocks of about ``block_size`` bytes, gzipped if
+    ``compress``.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    block = []
+    size = 0
+    for line in WRITERS[fmt](records(chunk_size)):
+        data = line.encode('utf-8')
+        block.append(data)
+        size += len(data)
+        if size >= block_size:
+            data = b''.join(block)
+            block = []
+            size = 0
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+    data = b''.join(block)
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
@@ -53,6 +53,12 @@ class PageForm(forms.ModelForm):
             return cleaned_data
 
 
+class PageItemForm(forms.Form):
+    """One page of a bulk add (views.add_pages)."""
+    title = forms.CharField(max_length=Page._meta.get_field('title').max_length)
+    url = forms.URLField(max_length=Page._meta.get_field('url').max_length)
+
+
 class UserForm(forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput(),
                                help_text="Please enter a password.")
@@ -0,0 +1,126 @@
+import io
+import logging
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# format name -> (Pillow format, file extension)
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg'),
+    'webp': ('WEBP', 'webp'),
+}
+
+
+def supported_formats():
+    """Derivative formats this Pillow build can write; JPEG always."""
+    formats = ['jpeg']
+    if features.check('webp'):
+        formats.append('webp')
+    return formats
+
+
+def open_image(image_file):
+    image_file.open('rb')
+    try:
+        image = Image.open(image_file)
+        image.load()
+    finally:
+        image_file.close()
+    return image
+
+
+def render(image, size, format='jpeg', quality=None):
+    """
+    Return a ContentFile holding ``image`` scaled and centre-cropped to
+    exactly ``size`` (width, height) in ``format``.
+    """
+    if quality is None:
+        quality = getattr(settings, 'RANGO_IMAGE_QUALITY', 80)
+    pil_format = FORMATS[format][0]
+    if pil_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    image = ImageOps.fit(image, size, Image.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format=pil_format, quality=quality)
+    return ContentFile(output.getvalue())
+
+
+def derivative_name(name, label, format):
+    """profile_images/me.png -> profile_images/derivatives/me_thumbnail.webp"""
+    directory, filename = posixpath.split(name)
+    base = os.path.splitext(filename)[0]
+    return posixpath.join(directory, 'derivatives', '{}_{}.{}'.format(
+        base, label, FORMATS[format][1]))
+
+
+def make_derivatives(field_file, sizes):
+    """
+    Write every size in ``sizes`` (``(label, (width, height))`` pairs) in
+    every supported format next to ``field_file``, using its storage.
+    Returns ``{label: {format: name}}`` with the names actually stored.
+    """
+    image = open_image(field_file)
+    storage = field_file.storage
+    formats = supported_formats()
+    derivatives = {}
+    for label, size in sizes:
+        derivatives[label] = dict(
+            (format, storage.save(derivative_name(field_file.name, label, format),
+                                  render(image, size, format)))
+            for format in formats)
+    return derivatives
+
+
+def delete_derivatives(storage, derivatives):
+    for names in derivatives.values():
+        for name in names.values():
+            try:
+                storage.delete(name)
+            except Exception:
+                logger.warning('Could not delete image %s', name, exc_info=True)
+
+
+class ImageWorkers(object):
+    """
+    Runs image processing off the request thread on a small pool of
+    threads. With ``RANGO_IMAGE_WORKERS = 0`` jobs run inline instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'RANGO_IMAGE_WORKERS', 2))
+            return self._executor
+
+    def submit(self, func, *args):
+        if not getattr(settings, 'RANGO_IMAGE_WORKERS', 2):
+            func(*args)
+        else:
+            self.get_executor().submit(self._run, func, *args)
+
+    @staticmethod
+    def _run(func, *args):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Image processing failed')
+        finally:
+            # Worker threads outlive requests, so nothing else closes
+            # their database connection.
+            connection.close()
+
+
+image_workers = ImageWorkers()
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from tango_with_django.rango.models import Category, Page
+from tango_with_django.rango.versions import bump_version, get_version
+
+
+class Leaderboard(object):
+    """
+    The top N rows of a model by a score field, kept in the cache.
+
+    The list is computed with one ``ORDER BY score DESC LIMIT N`` query
+    (backed by an index on the score) and served from the cache until it
+    goes stale (RANGO_LEADERBOARD_TIMEOUT) or is invalidated. Score changes
+    for rows already on the board are applied to the cached list in place;
+    anything that might change membership invalidates it.
+    """
+
+    def __init__(self, name, model, score_field):
+        self.name = name
+        self.model = model
+        self.score_field = score_field
+
+    @property
+    def size(self):
+        return getattr(settings, 'RANGO_LEADERBOARD_SIZE', 5)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'RANGO_LEADERBOARD_TIMEOUT', 60)
+
+    @property
+    def version_name(self):
+        return 'leaderboard:{}'.format(self.name)
+
+    def make_key(self):
+        return 'rango:leaderboard:{}:{}:{}'.format(
+            self.name, self.size, get_version(self.version_name))
+
+    def queryset(self):
+        return self.model.objects.order_by('-' + self.score_field, 'id')[:self.size]
+
+    def top(self):
+        key = self.make_key()
+        entries = cache.get(key)
+        if entries is None:
+            entries = list(self.queryset())
+            cache.set(key, entries, self.timeout)
+        return entries
+
+    def update_score(self, obj_id, score):
+        key = self.make_key()
+        entries = cache.get(key)
+        if entries is None:
+            return
+        for entry in entries:
+            if entry.pk == obj_id:
+                setattr(entry, self.score_field, score)
+                entries.sort(key=lambda e: (-getattr(e, self.score_field), e.pk))
+                cache.set(key, entries, self.timeout)
+                return
+        lowest = getattr(entries[-1], self.score_field) if entries else None
+        if len(entries) < self.size or score > lowest:
+            self.invalidate()
+
+    def invalidate(self):
+        bump_version(self.version_name)
+
+
+category_leaderboard = Leaderboard('categories', Category, 'likes')
+page_leaderboard = Leaderboard('pages', Page, 'views')
@@ -0,0 +1,41 @@
+from django.db import connections, router
+from django.db.models import F
+
+from tango_with_django.rango.models import Category
+
+
+def supports_returning(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def add_like(category_id, amount=1):
+    """
+    Atomically add ``amount`` likes to a category and return the new total,
+    or None if the category does not exist.
+
+    The increment happens in the database (``likes = likes + 1``), so
+    concurrent likes are never lost, and Category.save() (which reslugs
+    and rewrites every column) is bypassed. Where the backend supports
+    ``UPDATE ... RETURNING`` the new total comes back from the same
+    statement; otherwise it is read back inside the request transaction.
+    """
+    connection = connections[router.db_for_write(Category)]
+    if supports_returning(connection):
+        qn = connection.ops.quote_name
+        likes = qn(Category._meta.get_field('likes').column)
+        sql = 'UPDATE {table} SET {likes} = {likes} + %s WHERE {pk} = %s RETURNING {likes}'.format(
+            table=qn(Category._meta.db_table), likes=likes,
+            pk=qn(Category._meta.pk.column))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [amount, category_id])
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    categories = Category.objects.filter(id=category_id)
+    if not categories.update(likes=F('likes') + amount):
+        return None
+    return categories.values_list('likes', flat=True).first()
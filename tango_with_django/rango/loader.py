@@ -0,0 +1,209 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import connections, router, transaction
+from django.template.defaultfilters import slugify
+from django.utils import timezone
+
+from tango_with_django.rango.leaderboards import category_leaderboard, page_leaderboard
+from tango_with_django.rango.models import Category, Page
+from tango_with_django.rango.versions import bump_version
+
+
+def read_json(stream):
+    """
+    Records from a JSON document: a list of categories, each optionally
+    holding a ``pages`` list, as used by populate_rango.py.
+    """
+    data = json.load(stream)
+    if isinstance(data, dict):
+        data = [dict(category, name=name) for name, category in data.items()]
+    for category in data:
+        pages = category.pop('pages', [])
+        yield category
+        for page in pages:
+            yield dict(page, category=category['name'])
+
+
+def read_jsonl(stream):
+    """Records from JSON lines, one category or page object per line."""
+    for line in stream:
+        line = line.strip()
+        if line:
+            record = json.loads(line)
+            pages = record.pop('pages', [])
+            yield record
+            for page in pages:
+                yield dict(page, category=record['name'])
+
+
+def read_csv(stream):
+    """
+    Records from CSV with a header row. Rows with a ``url`` are pages of
+    ``category``; ``category_views``/``category_likes`` set the category's
+    counters.
+    """
+    for row in csv.DictReader(stream):
+        row = dict((k, v) for k, v in row.items() if v not in (None, ''))
+        category = {'name': row['category']}
+        if 'category_views' in row:
+            category['views'] = row['category_views']
+        if 'category_likes' in row:
+            category['likes'] = row['category_likes']
+        yield category
+        if row.get('url'):
+            yield {'category': row['category'], 'title': row.get('title', ''),
+                   'url': row['url'], 'views': row.get('views', 0)}
+
+
+READERS = {
+    'json': read_json,
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class RangoLoader(object):
+    """
+    Loads categories and pages in batches.
+
+    Records are dictionaries: categories have a ``name`` (and optionally
+    ``views``/``likes``), pages have a ``category`` name, ``title``,
+    ``url`` and optionally ``views``. Each batch looks up the existing
+    rows with one query per table, inserts the missing ones with multi-row
+    INSERTs and only updates counters that differ, with one UPDATE per
+    distinct value. Pages are matched on (category, url), so loading the
+    same data twice writes nothing.
+    """
+
+    def __init__(self, batch_size=5000):
+        self.batch_size = batch_size
+        self.categories = {}
+        self.stats = dict.fromkeys(['records', 'categories_created',
+                                    'categories_updated', 'pages_created',
+                                    'pages_updated'], 0)
+
+    def load(self, records):
+        with transaction.atomic():
+            for batch in batched(records, self.batch_size):
+                self.load_batch(batch)
+        # Bulk writes send no signals; invalidate the caches they drive
+        bump_version('categories')
+        category_leaderboard.invalidate()
+        page_leaderboard.invalidate()
+        return self.stats
+
+    def load_batch(self, batch):
+        self.stats['records'] += len(batch)
+        categories = {}
+        pages = {}
+        for record in batch:
+            if 'url' in record:
+                categories.setdefault(record['category'], {})
+                pages[(record['category'], record['url'])] = record
+            else:
+                categories.setdefault(record['name'], {}).update(record)
+        self.load_categories(categories)
+        self.load_pages(pages)
+
+    def load_categories(self, records):
+        names = list(records)
+        current = dict(
+            (name, (pk, views, likes)) for name, pk, views, likes in
+            Category.objects.filter(name__in=names).values_list(
+                'name', 'id', 'views', 'likes'))
+        new = [Category(name=name, slug=slugify(name),
+                        views=abs(int(records[name].get('views', 0))),
+                        likes=int(records[name].get('likes', 0)))
+               for name in names if name not in current]
+        if new:
+            Category.objects.bulk_create(new)
+            current.update(
+                (name, (pk, None, None)) for name, pk in
+                Category.objects.filter(
+                    name__in=[c.name for c in new]).values_list('name', 'id'))
+            self.stats['categories_created'] += len(new)
+        created = set(c.name for c in new)
+
+        changed = set()
+        for field, index in (('views', 1), ('likes', 2)):
+            values = {}
+            for name, record in records.items():
+                if field in record and name not in created:
+                    value = int(record[field])
+                    if field == 'views':
+                        value = abs(value)
+                    if value != current[name][index]:
+                        values[current[name][0]] = value
+            self.update_changed(Category, field, values)
+            changed.update(values)
+        self.stats['categories_updated'] += len(changed)
+        self.categories.update((name, row[0]) for name, row in current.items())
+
+    @staticmethod
+    def update_changed(model, field, values):
+        """Set ``field`` per primary key, one UPDATE per distinct value."""
+        by_value = {}
+        for pk, value in values.items():
+            by_value.setdefault(value, []).append(pk)
+        for value, pks in by_value.items():
+            model.objects.filter(pk__in=pks).update(**{field: value})
+
+    def insert_pages(self, rows):
+        """
+        Insert (category_id, title, url, views) rows with multi-row INSERT
+        statements. Equivalent to Page.objects.bulk_create() but without
+        building a model instance and preparing every field per row, which
+        dominates the cost of large loads.
+        """
+        connection = connections[router.db_for_write(Page)]
+        qn = connection.ops.quote_name
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        epoch = connection.ops.adapt_datetimefield_value(
+            Page._meta.get_field('last_visit').get_default())
+        columns = ['category_id', 'title', 'url', 'views', 'first_visit', 'last_visit']
+        fields = [Page._meta.get_field(name.replace('_id', '')) for name in columns]
+        batch_size = connection.ops.bulk_batch_size(fields, rows) or len(rows)
+        with connection.cursor() as cursor:
+            for batch in batched(rows, batch_size):
+                cursor.execute(
+                    'INSERT INTO {} ({}) VALUES {}'.format(
+                        qn(Page._meta.db_table),
+                        ', '.join(qn(column) for column in columns),
+                        ', '.join(['({})'.format(', '.join(['%s'] * len(columns)))] * len(batch))),
+                    [value for row in batch for value in row + (now, epoch)])
+
+    def load_pages(self, records):
+        if not records:
+            return
+        keys = dict(((self.categories[name], url), record)
+                    for (name, url), record in records.items())
+        existing = dict(
+            ((category_id, url), (pk, views)) for pk, category_id, url, views in
+            Page.objects.filter(url__in=set(k[1] for k in keys)).values_list(
+                    'id', 'category_id', 'url', 'views')
+            if (category_id, url) in keys)
+
+        new = [(category_id, record.get('title', ''), url,
+                int(record.get('views', 0)))
+               for (category_id, url), record in keys.items()
+               if (category_id, url) not in existing]
+        if new:
+            self.insert_pages(new)
+            self.stats['pages_created'] += len(new)
+
+        views = dict((pk, int(keys[key]['views']))
+                     for key, (pk, current) in existing.items()
+                     if 'views' in keys[key] and int(keys[key]['views']) != current)
+        self.update_changed(Page, 'views', views)
+        self.stats['pages_updated'] += len(views)
@@ -0,0 +1,51 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalLRUCache(object):
+    """
+    A small thread-safe, per-process LRU cache with a time to live.
+
+    Sits in front of the shared Django cache for values that are read on
+    every request; entries expire after ``timeout`` seconds so changes
+    made by other processes are picked up eventually.
+    """
+
+    def __init__(self, max_size=1024, timeout=60):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if not self.max_size:
+            return
+        with self._lock:
+            self._data[key] = (time.time() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
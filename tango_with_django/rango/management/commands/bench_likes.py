@@ -0,0 +1,61 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from tango_with_django.rango.likes import add_like
+from tango_with_django.rango.models import Category
+
+
+class Command(BaseCommand):
+    help = ('Hammer rango.likes.add_like from many threads and check that '
+            'no likes are lost.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Total number of likes to send.')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        per_thread = options['requests'] // threads
+        total = per_thread * threads
+        category = Category.objects.create(
+            name='bench-likes-{}'.format(time.time()))
+        seen = []
+        errors = []
+
+        def worker():
+            counts = []
+            try:
+                for _ in range(per_thread):
+                    counts.append(add_like(category.id))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                seen.extend(counts)
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.time()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.time() - start
+
+        try:
+            category.refresh_from_db()
+            if errors:
+                raise CommandError('{} workers failed: {!r}'.format(
+                    len(errors), errors[0]))
+            self.stdout.write('{} likes from {} threads in {:.2f}s ({:.0f}/s)'.format(
+                total, threads, elapsed, total / elapsed))
+            # Every increment must have observed a distinct total
+            if category.likes != total or len(set(seen)) != total:
+                raise CommandError('Lost updates: expected {}, got {} ({} distinct)'.format(
+                    total, category.likes, len(set(seen))))
+            self.stdout.write(self.style.SUCCESS('No lost updates.'))
+        finally:
+            category.delete()
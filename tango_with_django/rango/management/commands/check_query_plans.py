@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tango_with_django.rango.query_plans import explain, full_scans, hot_queries
+
+
+class Command(BaseCommand):
+    help = ('EXPLAIN the queries behind the busiest rango views and fail if '
+            'any of them scans a whole table. Use -v 2 to print the plans.')
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, query in hot_queries():
+            plan = explain(query)
+            scans = full_scans(plan)
+            if scans:
+                failed.append(name)
+            self.stdout.write('{:<30} {}'.format(name, 'FULL SCAN' if scans else 'ok'))
+            if scans or options['verbosity'] > 1:
+                for line in plan:
+                    self.stdout.write('    ' + line)
+        if failed:
+            raise CommandError('Full scans in: {}'.format(', '.join(failed)))
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tango_with_django.rango.export import WRITERS, export
+
+
+class Command(BaseCommand):
+    help = ('Export all categories and pages as JSON lines or CSV, in the '
+            'format load_rango reads. Memory use does not grow with the '
+            'size of the tables.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-',
+                            help="File to write, or '-' for stdout (the default).")
+        parser.add_argument('--format', choices=sorted(WRITERS),
+                            help='Output format; guessed from the file extension, '
+                                 'jsonl by default.')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Compress the output; implied by a .gz file name.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows read per query.')
+
+    def get_format(self, path, options):
+        if options['format']:
+            return options['format']
+        name = path[:-3] if path.endswith('.gz') else path
+        fmt = os.path.splitext(name)[1].lstrip('.').lower() or 'jsonl'
+        if fmt not in WRITERS:
+            raise CommandError('Cannot tell the format of {}; use --format.'.format(path))
+        return fmt
+
+    def handle(self, *args, **options):
+        path = options['output']
+        fmt = self.get_format(path, options)
+        compress = options['gzip'] or path.endswith('.gz')
+        start = time.time()
+        written = 0
+        if path == '-':
+            stream = sys.stdout.buffer
+        else:
+            stream = open(path, 'wb')
+        try:
+            for block in export(fmt, compress, options['chunk_size']):
+                stream.write(block)
+                written += len(block)
+        finally:
+            if path == '-':
+                stream.flush()
+            else:
+                stream.close()
+        self.stderr.write('Wrote {} bytes of {}{} in {:.2f}s'.format(
+            written, fmt, ' (gzip)' if compress else '', time.time() - start))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tango_with_django.rango.view_counter import page_view_counter
+
+
+class Command(BaseCommand):
+    help = 'Write buffered page clicks from the cache to Page.views.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', type=int, default=0, metavar='SECONDS',
+            help='Keep running, flushing every SECONDS seconds.')
+
+    def handle(self, *args, **options):
+        interval = options['loop']
+        while True:
+            total = page_view_counter.flush()
+            self.stdout.write('Flushed {} page views.'.format(total))
+            if not interval:
+                break
+            time.sleep(interval)
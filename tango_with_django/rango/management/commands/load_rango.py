@@ -0,0 +1,51 @@
+import io
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tango_with_django.rango.loader import READERS, RangoLoader
+
+
+class Command(BaseCommand):
+    help = ('Load categories and pages from JSON, JSON lines or CSV files. '
+            'Safe to run repeatedly; existing rows are updated.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', metavar='FILE',
+                            help="Files to load, or '-' for stdin.")
+        parser.add_argument('--format', choices=sorted(READERS),
+                            help='Input format; guessed from the file '
+                                 'extension by default.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def get_format(self, path, options):
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in READERS:
+            raise CommandError('Cannot tell the format of {}; use --format.'.format(path))
+        return fmt
+
+    def read(self, paths, options):
+        for path in paths:
+            reader = READERS[self.get_format(path, options)]
+            if path == '-':
+                stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+                for record in reader(stream):
+                    yield record
+            else:
+                with open(path, encoding='utf-8', newline='') as stream:
+                    for record in reader(stream):
+                        yield record
+
+    def handle(self, *args, **options):
+        loader = RangoLoader(batch_size=options['batch_size'])
+        start = time.time()
+        stats = loader.load(self.read(options['files'], options))
+        elapsed = max(time.time() - start, 1e-6)
+        rows = stats['records']
+        self.stdout.write(
+            'Categories: {categories_created} created, {categories_updated} updated. '
+            'Pages: {pages_created} created, {pages_updated} updated.'.format(**stats))
+        self.stdout.write('{} records in {:.2f}s ({:.0f} records/s)'.format(
+            rows, elapsed, rows / elapsed))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from tango_with_django.rango.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = ('Make the resized copies of profile pictures that are missing '
+            'or out of date, e.g. for pictures uploaded before they existed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Remake the copies of every picture.')
+
+    def handle(self, *args, **options):
+        count = 0
+        profiles = UserProfile.objects.exclude(picture='').only('picture', 'derivatives')
+        for profile in profiles.iterator():
+            if options['all'] or not profile.images_ready:
+                profile.make_derivatives()
+                count += 1
+        self.stdout.write('Made images for {} profiles.'.format(count))
@@ -0,0 +1,203 @@
+import bisect
+import functools
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+_local = threading.local()
+
+# Upper bounds, in seconds, of the request duration histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class RequestMetrics(object):
+    """What one sampled request spent its time on."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self._template_depth = 0
+        self._cache_depth = 0
+        self._query_log = {}
+        self._debug_cursor = {}
+        self._caches = []
+
+    def begin(self):
+        _local.metrics = self
+        # Django 1.11 has no hook around query execution, so use the
+        # debug cursor's query log for the length of this request.
+        for connection in connections.all():
+            self._debug_cursor[connection.alias] = connection.force_debug_cursor
+            self._query_log[connection.alias] = len(connection.queries_log)
+            connection.force_debug_cursor = True
+        # Cache instances are per thread, so counting wrappers set on them
+        # only see this request.
+        for alias in settings.CACHES:
+            cache = caches[alias]
+            cache.get = self._counted_get(cache.get)
+            cache.get_many = self._counted_get_many(cache.get_many)
+            self._caches.append(cache)
+
+    def end(self):
+        self.total = time.perf_counter() - self.start
+        for connection in connections.all():
+            log = list(connection.queries_log)[self._query_log.get(connection.alias, 0):]
+            self.queries += len(log)
+            self.db_time += sum(float(query['time']) for query in log)
+            connection.force_debug_cursor = self._debug_cursor.get(connection.alias, False)
+        for cache in self._caches:
+            del cache.get
+            del cache.get_many
+        _local.metrics = None
+
+    def _counted_get(self, get):
+        @functools.wraps(get)
+        def counted_get(key, default=None, **kwargs):
+            self._cache_depth += 1
+            try:
+                value = get(key, default, **kwargs)
+            finally:
+                self._cache_depth -= 1
+            if self._cache_depth == 0:
+                if value is default:
+                    self.cache_misses += 1
+                else:
+                    self.cache_hits += 1
+            return value
+        return counted_get
+
+    def _counted_get_many(self, get_many):
+        @functools.wraps(get_many)
+        def counted_get_many(keys, **kwargs):
+            keys = list(keys)
+            # Some backends implement get_many() with get(); count once
+            self._cache_depth += 1
+            try:
+                values = get_many(keys, **kwargs)
+            finally:
+                self._cache_depth -= 1
+            if self._cache_depth == 0:
+                self.cache_hits += len(values)
+                self.cache_misses += len(keys) - len(values)
+            return values
+        return counted_get_many
+
+    def server_timing(self):
+        """The metrics as a Server-Timing header value (durations in ms)."""
+        return ', '.join([
+            'db;dur={:.1f};desc="{} queries"'.format(self.db_time * 1000, self.queries),
+            'cache;desc="{} hits, {} misses"'.format(self.cache_hits, self.cache_misses),
+            'tpl;dur={:.1f}'.format(self.template_time * 1000),
+            'total;dur={:.1f}'.format(self.total * 1000),
+        ])
+
+
+def current():
+    """The RequestMetrics of the request being handled, if it is sampled."""
+    return getattr(_local, 'metrics', None)
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def timed_render(self, *args, **kwargs):
+        metrics = current()
+        if metrics is None:
+            return render(self, *args, **kwargs)
+        # Templates rendered while rendering another (e.g. by a template
+        # tag) are already inside the outer render's time.
+        metrics._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics._template_depth -= 1
+            if metrics._template_depth == 0:
+                metrics.template_time += time.perf_counter() - start
+    timed_render.metrics_wrapped = True
+    return timed_render
+
+
+def install():
+    """Time template rendering; a no-op for requests that are not sampled."""
+    from django.template.backends.django import Template
+    if not getattr(Template.render, 'metrics_wrapped', False):
+        Template.render = _timed_render(Template.render)
+
+
+class MetricsRegistry(object):
+    """
+    Per-view totals and a request duration histogram, kept in process
+    memory. Each worker process reports its own; Prometheus adds them up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, metrics):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = {
+                    'buckets': [0] * len(BUCKETS), 'count': 0, 'duration': 0.0,
+                    'queries': 0, 'db_time': 0.0, 'cache_hits': 0,
+                    'cache_misses': 0, 'template_time': 0.0}
+            stats['buckets'][bisect.bisect_left(BUCKETS, metrics.total)] += 1
+            stats['count'] += 1
+            stats['duration'] += metrics.total
+            stats['queries'] += metrics.queries
+            stats['db_time'] += metrics.db_time
+            stats['cache_hits'] += metrics.cache_hits
+            stats['cache_misses'] += metrics.cache_misses
+            stats['template_time'] += metrics.template_time
+
+    def snapshot(self):
+        with self._lock:
+            return dict((view, dict(stats, buckets=list(stats['buckets'])))
+                        for view, stats in self._views.items())
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+    def prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        views = sorted(self.snapshot().items())
+        lines = [
+            '# HELP rango_request_duration_seconds Time to handle sampled requests.',
+            '# TYPE rango_request_duration_seconds histogram',
+        ]
+        for view, stats in views:
+            cumulative = 0
+            for bound, count in zip(BUCKETS, stats['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('rango_request_duration_seconds_bucket{{view="{}",le="{}"}} {}'.format(
+                    view, le, cumulative))
+            lines.append('rango_request_duration_seconds_sum{{view="{}"}} {}'.format(
+                view, stats['duration']))
+            lines.append('rango_request_duration_seconds_count{{view="{}"}} {}'.format(
+                view, stats['count']))
+        for name, key, description in (
+                ('rango_db_queries_total', 'queries', 'Database queries made.'),
+                ('rango_db_duration_seconds_total', 'db_time', 'Time spent in database queries.'),
+                ('rango_cache_hits_total', 'cache_hits', 'Cache reads that found a value.'),
+                ('rango_cache_misses_total', 'cache_misses', 'Cache reads that found nothing.'),
+                ('rango_template_duration_seconds_total', 'template_time',
+                 'Time spent rendering templates.')):
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} counter'.format(name))
+            for view, stats in views:
+                lines.append('{}{{view="{}"}} {}'.format(name, view, stats[key]))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
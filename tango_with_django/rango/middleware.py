@@ -0,0 +1,40 @@
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from tango_with_django.rango import metrics
+
+
+class RequestMetricsMiddleware(object):
+    """
+    Records query count, database time, cache hits/misses, template time
+    and total time for a sample of requests (RANGO_METRICS_SAMPLE_RATE).
+    Sampled responses carry them in a Server-Timing header, and they are
+    added up per view for the rango:metrics endpoint. Does nothing unless
+    RANGO_METRICS_ENABLED is set.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'RANGO_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'RANGO_METRICS_SAMPLE_RATE', 1.0)
+        self.server_timing = getattr(settings, 'RANGO_METRICS_SERVER_TIMING', True)
+        metrics.install()
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+        request_metrics = metrics.RequestMetrics()
+        request_metrics.begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_metrics.end()
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.registry.record(view, request_metrics)
+        if self.server_timing:
+            response['Server-Timing'] = request_metrics.server_timing()
+        return response
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from tango_with_django.rango.search import (
+    install_search_indexes, uninstall_search_indexes)
+
+
+def forwards(apps, schema_editor):
+    install_search_indexes(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    uninstall_search_indexes(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0003_auto_20180220_1211'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Count, Max, Min, Sum
+
+
+def forwards(apps, schema_editor):
+    """
+    Merge pages listed more than once in a category, ahead of the unique
+    (url, category) index: the oldest copy is kept with the views of all.
+    """
+    Page = apps.get_model('rango', 'Page')
+    duplicates = (Page.objects.values('category_id', 'url')
+                  .annotate(copies=Count('id'), keep=Min('id'), total=Sum('views'),
+                            first=Min('first_visit'), last=Max('last_visit'))
+                  .filter(copies__gt=1).order_by())
+    for group in duplicates:
+        pages = Page.objects.filter(category_id=group['category_id'], url=group['url'])
+        pages.exclude(id=group['keep']).delete()
+        pages.update(views=group['total'], first_visit=group['first'],
+                     last_visit=group['last'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0009_page_category_views_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.9 on 2026-10-18 19:33
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0011_dedupe_pages'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='page',
+            unique_together=set([('url', 'category')]),
+        ),
+    ]
@@ -1,10 +1,14 @@
+import json
 from datetime import datetime, tzinfo
 
-from django.db import models
+from django.db import models, transaction
 from django.template.defaultfilters import slugify
 from django.conf import settings
 from django.utils import timezone
 
+from tango_with_django.rango.images import (
+    delete_derivatives, image_workers, make_derivatives)
+
 
 class Category(models.Model):
 
@@ -21,6 +25,11 @@ class Category(models.Model):
                    
     class Meta:
         verbose_name_plural = 'categories'
+        indexes = [
+            # Leaderboard and sidebar (likes, then name) order
+            models.Index(fields=['-likes', 'name'],
+                         name='rango_category_likes_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -40,7 +49,17 @@ class Page(models.Model):
 	    if self.last_visit < timezone.now():
 	        self.last_visit = timezone.now()
 	    super(Page, self).save(*args, **kwargs)
-        
+
+    class Meta:
+        # A category lists each URL once. The unique index also serves
+        # lookups by url (loader.py) and by category and url (bulk_pages.py).
+        unique_together = [('url', 'category')]
+        indexes = [
+            models.Index(fields=['-views'], name='rango_page_views_idx'),
+            # Keyset pagination of a category's pages (views.py)
+            models.Index(fields=['category', '-views', 'id'],
+                         name='rango_page_cat_views_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -53,6 +72,84 @@ class UserProfile(models.Model):
     # Additional User attributes to include.
     website = models.URLField(blank=True)
     picture = models.ImageField(upload_to='profile_images', blank=True)
+    # JSON {"source": picture name, "sizes": {label: {format: name}}} of
+    # the resized copies of picture, made in the background on upload
+    derivatives = models.TextField(blank=True, editable=False)
+
+    # (label, (width, height)) of the derivatives; see images.py
+    DERIVATIVE_SIZES = (
+        ('thumbnail', (64, 64)),
+        ('display', (300, 300)),
+    )
+    # Name of the picture as last saved; None when the field was deferred
+    _saved_picture = ''
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(UserProfile, cls).from_db(db, field_names, values)
+        instance._saved_picture = (instance.picture.name
+                                   if 'picture' in instance.__dict__ else None)
+        return instance
+
+    def save(self, *args, **kwargs):
+        super(UserProfile, self).save(*args, **kwargs)
+        if self._saved_picture is not None and \
+                self.picture.name != self._saved_picture:
+            self._saved_picture = self.picture.name
+            pk, name = self.pk, self.picture.name
+            transaction.on_commit(lambda: image_workers.submit(
+                UserProfile.build_derivatives, pk, name))
+
+    @classmethod
+    def build_derivatives(cls, pk, picture_name):
+        """Make the derivatives of a profile unless its picture has changed since."""
+        profile = cls.objects.filter(pk=pk, picture=picture_name).first()
+        if profile is not None:
+            profile.make_derivatives()
+
+    def make_derivatives(self):
+        storage = self.picture.storage
+        old = self.get_derivatives()
+        new = {}
+        if self.picture:
+            new = make_derivatives(self.picture, self.DERIVATIVE_SIZES)
+        derivatives = json.dumps({'source': self.picture.name, 'sizes': new})
+        # Only store them if no newer picture was uploaded meanwhile
+        if UserProfile.objects.filter(pk=self.pk, picture=self.picture.name) \
+                .update(derivatives=derivatives):
+            self.derivatives = derivatives
+            delete_derivatives(storage, old)
+        else:
+            delete_derivatives(storage, new)
+
+    def get_derivatives(self):
+        """``{label: {format: name}}`` of the stored derivatives, of any picture."""
+        if not self.derivatives:
+            return {}
+        return json.loads(self.derivatives)['sizes']
+
+    @property
+    def images_ready(self):
+        """Whether the derivatives of the current picture have been made."""
+        return bool(self.derivatives) and \
+            json.loads(self.derivatives)['source'] == self.picture.name
+
+    @property
+    def images(self):
+        """
+        ``{label: {format: url}}`` for each derivative size of the current
+        picture. Until they are made, the picture itself stands in as the
+        ``jpeg`` of every size. Empty without a picture.
+        """
+        if not self.picture:
+            return {}
+        if self.images_ready:
+            storage = self.picture.storage
+            return dict((label, dict((format, storage.url(name))
+                                     for format, name in formats.items()))
+                        for label, formats in self.get_derivatives().items())
+        url = self.picture.url
+        return dict((label, {'jpeg': url}) for label, size in self.DERIVATIVE_SIZES)
 
     # Return out something useful
     def __str__(self):
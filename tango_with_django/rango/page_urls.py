@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from tango_with_django.rango.lru import LocalLRUCache
+from tango_with_django.rango.models import Page
+
+# Cached for page ids that do not exist, so bad links don't hit the db
+MISSING = ''
+
+
+class PageUrlCache(object):
+    """
+    Maps page ids to their target URL for the /rango/goto/ redirect.
+
+    Lookups go local LRU -> shared cache -> database. Entries are dropped
+    from both caches by the Page save/delete signal handlers; other
+    processes see the change once their local entry expires.
+    """
+    key_prefix = 'rango:pageurl'
+
+    def __init__(self):
+        self.local = LocalLRUCache(
+            max_size=getattr(settings, 'RANGO_PAGE_URL_CACHE_SIZE', 4096),
+            timeout=getattr(settings, 'RANGO_PAGE_URL_LOCAL_TIMEOUT', 30))
+
+    def make_key(self, page_id):
+        return '{}:{}'.format(self.key_prefix, page_id)
+
+    def get(self, page_id):
+        """Return the URL of the page, or None if it does not exist."""
+        key = self.make_key(page_id)
+        url = self.local.get(key)
+        if url is None:
+            url = cache.get(key)
+            if url is None:
+                url = Page.objects.filter(id=page_id).values_list(
+                    'url', flat=True).first() or MISSING
+                cache.set(key, url, getattr(
+                    settings, 'RANGO_PAGE_URL_CACHE_TIMEOUT', 60 * 60 * 24))
+            self.local.set(key, url)
+        return url or None
+
+    def invalidate(self, page_id):
+        key = self.make_key(page_id)
+        self.local.delete(key)
+        cache.delete(key)
+
+
+page_url_cache = PageUrlCache()
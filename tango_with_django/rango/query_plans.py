@@ -0,0 +1,75 @@
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from tango_with_django.rango.category_cache import get_category_pages_query
+from tango_with_django.rango.leaderboards import category_leaderboard, page_leaderboard
+from tango_with_django.rango.models import Category, Page
+from tango_with_django.rango.search import (
+    PostgresSearchBackend, SQLiteFTSBackend, get_search_backend)
+from tango_with_django.rango.sidebar import category_sidebar
+
+
+def hot_queries():
+    """
+    ``(name, query)`` for the queries behind rango's busiest views, where
+    ``query`` is a queryset or an ``(sql, params)`` pair. Where a view's
+    query is built by a function, it is used here, so the plans checked
+    are those of the queries the views run.
+    """
+    # Imported here: the views import most of rango
+    from tango_with_django.rango.views import get_profiles_query
+    queries = [
+        ('index: top categories', category_leaderboard.queryset()),
+        ('index: top pages', page_leaderboard.queryset()),
+        ('sidebar categories', category_sidebar.queryset()),
+        ('category by slug', Category.objects.filter(slug='python')),
+        ('category pages', get_category_pages_query(1)),
+        ('category pages after cursor', get_category_pages_query(1, '10.1')),
+        ('goto page url', Page.objects.filter(id=1).values_list('url')),
+        ('like category', Category.objects.filter(id=1).values_list('likes')),
+        ('profile list', get_profiles_query(
+            1, getattr(settings, 'RANGO_PROFILES_PER_PAGE', 25))),
+        ('load pages by url', Page.objects.filter(url__in=['http://example.com/'])),
+        ('load categories by name', Category.objects.filter(name__in=['Python'])),
+    ]
+    backend = get_search_backend()
+    if isinstance(backend, PostgresSearchBackend):
+        queries.append(('search', (backend.search_sql, ['python', 'python', 20, 0])))
+    elif isinstance(backend, SQLiteFTSBackend):
+        queries.append(('search', (backend.search_sql, ['"python"*', 20, 0])))
+    return queries
+
+
+def explain(query):
+    """Return the plan of ``query`` as a list of lines."""
+    if isinstance(query, tuple):
+        sql, params = query
+    else:
+        sql, params = query.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Tiny development tables are cheaper to scan than to index, so
+            # ask whether an index *can* be used rather than whether the
+            # planner prefers one at this size.
+            with transaction.atomic():
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+                return [row[0] for row in cursor.fetchall()]
+        elif connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+        raise NotImplementedError(
+            'Query plans are not supported on {}'.format(connection.vendor))
+
+
+def full_scans(plan):
+    """The lines of ``plan`` that read a whole table."""
+    if connection.vendor == 'postgresql':
+        pattern = r'Seq Scan on'
+    else:
+        # SQLite: "SCAN t" (or "SCAN TABLE t") without "USING ... INDEX",
+        # "USING INTEGER PRIMARY KEY" or a virtual table index
+        pattern = r'^SCAN (?!.*\b(USING|VIRTUAL TABLE INDEX)\b)'
+    return [line for line in plan if re.search(pattern, line.strip())]
@@ -0,0 +1,142 @@
+import functools
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+# Refill the bucket for the time since it was last used, then take a
+# token if there is one. Returns {allowed, seconds until a token}.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HMSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class RateLimiter(object):
+    """
+    Token buckets: each key holds up to ``burst`` tokens and gains
+    ``rate`` per second; a request that finds no token is refused.
+
+    The buckets live in Redis when the default cache is django-redis,
+    updated atomically by a Lua script, so all workers share them.
+    With another cache backend, or while Redis is unreachable, each
+    process keeps its own buckets in memory instead.
+    """
+    key_prefix = 'rango:ratelimit'
+    max_local_buckets = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._script = None
+        self._redis_checked = False
+
+    def get_script(self):
+        if not self._redis_checked:
+            self._redis_checked = True
+            try:
+                from django_redis import get_redis_connection
+                self._script = get_redis_connection('default').register_script(
+                    TOKEN_BUCKET_LUA)
+            except (ImportError, NotImplementedError):
+                self._script = None
+        return self._script
+
+    def make_key(self, scope, ident):
+        return '{}:{}:{}'.format(self.key_prefix, scope, ident)
+
+    def take(self, scope, ident, rate, burst):
+        """
+        Take a token from the bucket of ``ident`` (a user or address) for
+        ``scope``. Return ``(allowed, seconds until the next token)``.
+        """
+        key = self.make_key(scope, ident)
+        now = time.time()
+        script = self.get_script()
+        if script is not None:
+            try:
+                allowed, wait = script(keys=[cache.make_key(key)], args=[rate, burst, now])
+                return bool(allowed), float(wait)
+            except Exception:
+                logger.warning('Rate limiting in process; Redis failed', exc_info=True)
+        return self._take_local(key, rate, burst, now)
+
+    def _take_local(self, key, rate, burst, now):
+        with self._lock:
+            if key not in self._buckets and len(self._buckets) >= self.max_local_buckets:
+                # Buckets idle long enough to be full again are the default
+                self._buckets = dict(
+                    (k, (tokens, ts)) for k, (tokens, ts) in self._buckets.items()
+                    if tokens + (now - ts) * rate < burst)
+            tokens, ts = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + max(0, now - ts) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            return False, (1 - tokens) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+rate_limiter = RateLimiter()
+
+
+def client_ident(request):
+    """The user, or for anonymous requests the client's address."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return 'user:{}'.format(user.pk)
+    header = getattr(settings, 'RANGO_RATE_LIMIT_IP_HEADER', None)
+    address = request.META.get(header) if header else None
+    if address:
+        # Proxies append the address they saw; trust only the last one
+        address = address.split(',')[-1].strip()
+    return 'ip:{}'.format(address or request.META.get('REMOTE_ADDR', ''))
+
+
+def rate_limit(view, rate, burst):
+    """
+    Allow each user or address ``rate`` requests per second to ``view``,
+    in bursts of up to ``burst``; answer the rest with 429 Too Many
+    Requests. RANGO_RATE_LIMITS overrides ``(rate, burst)`` by URL name.
+    """
+    @functools.wraps(view)
+    def limited(request, *args, **kwargs):
+        if getattr(settings, 'RANGO_RATE_LIMIT_ENABLED', True):
+            scope = request.resolver_match.url_name if request.resolver_match else view.__name__
+            limit_rate, limit_burst = getattr(settings, 'RANGO_RATE_LIMITS', {}).get(
+                scope, (rate, burst))
+            allowed, wait = rate_limiter.take(scope, client_ident(request),
+                                              limit_rate, limit_burst)
+            if not allowed:
+                response = HttpResponse('Too many requests, slow down.', status=429,
+                                        content_type='text/plain')
+                response['Retry-After'] = str(int(math.ceil(wait)))
+                return response
+        return view(request, *args, **kwargs)
+    return limited
@@ -0,0 +1,245 @@
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from tango_with_django.rango.models import Page
+
+
+class BaseSearchBackend(object):
+    """
+    Searches pages by title, URL and category name.
+
+    Subclasses implement ``search_ids`` and return page ids, best match
+    first; ``search`` turns them into Page objects in that order.
+    """
+
+    def search(self, query, limit=20, offset=0):
+        ids = self.search_ids(query, limit, offset)
+        pages = Page.objects.select_related('category').in_bulk(ids)
+        return [pages[i] for i in ids if i in pages]
+
+    def search_ids(self, query, limit, offset):
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Unindexed ``icontains`` matching; works on any database."""
+
+    def search_ids(self, query, limit, offset):
+        pages = Page.objects.filter(
+            Q(title__icontains=query) | Q(url__icontains=query) |
+            Q(category__name__icontains=query)).order_by('-views', 'id')
+        return list(pages.values_list('id', flat=True)[offset:offset + limit])
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Full-text search over a GIN-indexed ``tsvector`` expression, ranked
+    with ``ts_rank``. Falls back to trigram similarity on the title (also
+    GIN-indexed) when full-text search finds nothing, e.g. for typos.
+    """
+    document = ("to_tsvector('english'::regconfig, "
+                "coalesce(p.title, '') || ' ' || coalesce(p.url, ''))")
+
+    search_sql = """
+        SELECT id FROM (
+            SELECT p.id, ts_rank({document}, q) AS rank, p.views
+              FROM rango_page p, plainto_tsquery('english'::regconfig, %s) q
+             WHERE {document} @@ q
+            UNION ALL
+            SELECT p.id, 0.05 AS rank, p.views
+              FROM rango_page p
+              JOIN rango_category c ON c.id = p.category_id,
+                   plainto_tsquery('english'::regconfig, %s) q
+             WHERE to_tsvector('english'::regconfig, c.name) @@ q
+        ) hits
+        GROUP BY id, views
+        ORDER BY sum(rank) DESC, views DESC, id
+        LIMIT %s OFFSET %s
+    """.format(document=document)
+
+    trigram_sql = """
+        SELECT id FROM rango_page
+         WHERE title %% %s
+         ORDER BY similarity(title, %s) DESC, views DESC, id
+         LIMIT %s OFFSET %s
+    """
+
+    _has_trigram = None
+
+    def has_trigram(self, cursor):
+        if self._has_trigram is None:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            self._has_trigram = cursor.fetchone() is not None
+        return self._has_trigram
+
+    def search_ids(self, query, limit, offset):
+        with connection.cursor() as cursor:
+            cursor.execute(self.search_sql, [query, query, limit, offset])
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids and not offset and self.has_trigram(cursor):
+                cursor.execute(self.trigram_sql, [query, query, limit, offset])
+                ids = [row[0] for row in cursor.fetchall()]
+        return ids
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 search, ranked with bm25. The ``rango_page_fts`` table is
+    kept in sync with rango_page/rango_category by triggers; see
+    ``install_search_indexes``.
+    """
+    # bm25 weights for the title, url and category columns
+    weights = (10.0, 1.0, 5.0)
+
+    search_sql = """
+        SELECT rowid FROM rango_page_fts
+         WHERE rango_page_fts MATCH %s
+         ORDER BY bm25(rango_page_fts, {}, {}, {})
+         LIMIT %s OFFSET %s
+    """.format(*weights)
+
+    @staticmethod
+    def match_expression(query):
+        # Quote every word so FTS5 syntax in user input is taken literally,
+        # and prefix-match it so partial words still find pages.
+        words = re.findall(r'\w+', query)
+        return ' '.join('"{}"*'.format(word) for word in words)
+
+    def search_ids(self, query, limit, offset):
+        match = self.match_expression(query)
+        if not match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(self.search_sql, [match, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+SQLITE_FTS_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS rango_page_fts
+       USING fts5(title, url, category, tokenize='porter unicode61')""",
+    """DELETE FROM rango_page_fts""",
+    """INSERT INTO rango_page_fts(rowid, title, url, category)
+       SELECT p.id, p.title, p.url, c.name
+         FROM rango_page p JOIN rango_category c ON c.id = p.category_id""",
+    """CREATE TRIGGER IF NOT EXISTS rango_page_fts_insert
+       AFTER INSERT ON rango_page BEGIN
+           INSERT INTO rango_page_fts(rowid, title, url, category)
+           SELECT new.id, new.title, new.url, name
+             FROM rango_category WHERE id = new.category_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS rango_page_fts_update
+       AFTER UPDATE OF title, url, category_id ON rango_page BEGIN
+           DELETE FROM rango_page_fts WHERE rowid = old.id;
+           INSERT INTO rango_page_fts(rowid, title, url, category)
+           SELECT new.id, new.title, new.url, name
+             FROM rango_category WHERE id = new.category_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS rango_page_fts_delete
+       AFTER DELETE ON rango_page BEGIN
+           DELETE FROM rango_page_fts WHERE rowid = old.id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS rango_category_fts_update
+       AFTER UPDATE OF name ON rango_category BEGIN
+           UPDATE rango_page_fts SET category = new.name
+            WHERE rowid IN (SELECT id FROM rango_page
+                             WHERE category_id = new.id);
+       END""",
+]
+
+SQLITE_FTS_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS rango_category_fts_update",
+    "DROP TRIGGER IF EXISTS rango_page_fts_delete",
+    "DROP TRIGGER IF EXISTS rango_page_fts_update",
+    "DROP TRIGGER IF EXISTS rango_page_fts_insert",
+    "DROP TABLE IF EXISTS rango_page_fts",
+]
+
+POSTGRES_SEARCH_SQL = [
+    """CREATE INDEX IF NOT EXISTS rango_page_search_idx ON rango_page
+       USING GIN ((to_tsvector('english'::regconfig,
+                   coalesce(title, '') || ' ' || coalesce(url, ''))))""",
+    """CREATE INDEX IF NOT EXISTS rango_category_search_idx ON rango_category
+       USING GIN ((to_tsvector('english'::regconfig, name)))""",
+]
+
+POSTGRES_TRIGRAM_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """CREATE INDEX IF NOT EXISTS rango_page_title_trgm_idx ON rango_page
+       USING GIN (title gin_trgm_ops)""",
+]
+
+POSTGRES_SEARCH_DROP_SQL = [
+    "DROP INDEX IF EXISTS rango_category_search_idx",
+    "DROP INDEX IF EXISTS rango_page_title_trgm_idx",
+    "DROP INDEX IF EXISTS rango_page_search_idx",
+]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def install_search_indexes(schema_editor):
+    """
+    Create the search tables/indexes for the database in use. Safe to run
+    again, e.g. after a migration that rebuilds rango_page on SQLite
+    (which drops its triggers).
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        statements = POSTGRES_SEARCH_SQL
+        try:
+            # pg_trgm needs CREATE privilege on the database; the trigram
+            # fallback is skipped without it.
+            with transaction.atomic(using=connection.alias):
+                for sql in POSTGRES_TRIGRAM_SQL:
+                    schema_editor.execute(sql, params=None)
+        except DatabaseError:
+            pass
+    elif connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        statements = SQLITE_FTS_SQL
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql, params=None)
+
+
+def uninstall_search_indexes(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {
+        'postgresql': POSTGRES_SEARCH_DROP_SQL,
+        'sqlite': SQLITE_FTS_DROP_SQL,
+    }.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql, params=None)
+
+
+_backend = None
+
+
+def get_search_backend():
+    """
+    Return the backend named by ``RANGO_SEARCH_BACKEND``, or pick one for
+    the default database: PostgreSQL full-text search, SQLite FTS5 if the
+    search table exists, else simple ``icontains`` matching.
+    """
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'RANGO_SEARCH_BACKEND', None)
+        if path:
+            backend_class = import_string(path)
+        elif connection.vendor == 'postgresql':
+            backend_class = PostgresSearchBackend
+        elif (connection.vendor == 'sqlite' and 'rango_page_fts' in
+                connection.introspection.table_names()):
+            backend_class = SQLiteFTSBackend
+        else:
+            backend_class = SimpleSearchBackend
+        _backend = backend_class()
+    return _backend
@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from tango_with_django.rango.models import Category
+from tango_with_django.rango.versions import bump_version, get_version
+
+
+class CategorySidebar(object):
+    """
+    The category sidebar (rango/cats.html): the RANGO_SIDEBAR_CATEGORIES
+    most liked categories, followed by a count of the rest.
+
+    The list is cached under the ``categories`` version and one of its
+    own, and the HTML per active category under both. As with the
+    leaderboards, likes are applied to the cached list in place; only a
+    like that moves a category past a neighbour (or into the list)
+    invalidates it, and with it the ETags of the pages that show it.
+    """
+    key_prefix = 'rango:sidebar'
+    version_name = 'sidebar'
+
+    @property
+    def size(self):
+        return getattr(settings, 'RANGO_SIDEBAR_CATEGORIES', 20)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'RANGO_SIDEBAR_CACHE_TIMEOUT', 300)
+
+    def stamp(self):
+        """Version numbers that change whenever the sidebar would."""
+        return get_version('categories'), get_version(self.version_name)
+
+    def queryset(self):
+        """The listed categories, and one more if there are more."""
+        return Category.objects.order_by('-likes', 'name')[:self.size + 1]
+
+    def make_key(self, stamp):
+        return '{}:list:{}:{}:{}'.format(self.key_prefix, self.size, *stamp)
+
+    def get(self, stamp=None):
+        """Return ``(categories, more)``; ``categories`` has one extra if ``more``."""
+        key = self.make_key(stamp or self.stamp())
+        entry = cache.get(key)
+        if entry is None:
+            categories = list(self.queryset())
+            more = 0
+            if len(categories) > self.size:
+                more = Category.objects.count() - self.size
+            entry = (categories, more)
+            cache.set(key, entry, self.timeout)
+        return entry
+
+    def render(self, active=None):
+        stamp = self.stamp()
+        key = '{}:html:{}:{}:{}:{}'.format(self.key_prefix, self.size, stamp[0], stamp[1],
+                                           active.pk if active else '')
+        html = cache.get(key)
+        if html is None:
+            categories, more = self.get(stamp)
+            html = render_to_string('rango/cats.html', {
+                'cats': categories[:self.size], 'act_cat': active, 'more': more})
+            cache.set(key, html, self.timeout)
+        return html
+
+    def update_likes(self, category_id, likes):
+        key = self.make_key(self.stamp())
+        entry = cache.get(key)
+        if entry is None:
+            return
+        categories = entry[0]
+        for i, category in enumerate(categories):
+            if category.pk == category_id:
+                category.likes = likes
+                rank = (-likes, category.name)
+                if (i > 0 and rank < (-categories[i - 1].likes, categories[i - 1].name)) or \
+                        (i + 1 < len(categories) and
+                         rank > (-categories[i + 1].likes, categories[i + 1].name)):
+                    self.invalidate()
+                else:
+                    cache.set(key, entry, self.timeout)
+                return
+        # Not listed: it may have joined the list (or the list is out of date)
+        if len(categories) <= self.size or likes >= categories[-1].likes:
+            self.invalidate()
+
+    def invalidate(self):
+        bump_version(self.version_name)
+
+
+category_sidebar = CategorySidebar()
@@ -0,0 +1,58 @@
+import functools
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tango_with_django.rango.category_cache import category_page_cache
+from tango_with_django.rango.leaderboards import category_leaderboard, page_leaderboard
+from tango_with_django.rango.models import Category, Page
+from tango_with_django.rango.page_urls import page_url_cache
+from tango_with_django.rango.suggestions import CategorySuggestion, category_index
+
+# The handlers clear or update shared caches once the transaction
+# commits: before then, a concurrent request would refill them from the
+# rows as they were, and a rollback would leave them describing rows that
+# never existed. Ids are bound now, as a delete clears the instance's pk.
+
+
+@receiver([post_save, post_delete], sender=Page,
+          dispatch_uid='rango_page_url_invalidate')
+def invalidate_page_url(sender, instance, **kwargs):
+    transaction.on_commit(functools.partial(page_url_cache.invalidate, instance.pk))
+
+
+@receiver(post_save, sender=Category, dispatch_uid='rango_category_index_update')
+def update_category_index(sender, instance, **kwargs):
+    suggestion = CategorySuggestion(instance.id, instance.name, instance.slug, instance.likes)
+    transaction.on_commit(functools.partial(category_index.update, suggestion))
+
+
+@receiver(post_delete, sender=Category, dispatch_uid='rango_category_index_remove')
+def remove_from_category_index(sender, instance, **kwargs):
+    transaction.on_commit(functools.partial(category_index.remove, instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Category,
+          dispatch_uid='rango_category_leaderboard_invalidate')
+def invalidate_category_leaderboard(sender, **kwargs):
+    transaction.on_commit(category_leaderboard.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Page,
+          dispatch_uid='rango_page_leaderboard_invalidate')
+def invalidate_page_leaderboard(sender, **kwargs):
+    transaction.on_commit(page_leaderboard.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Page,
+          dispatch_uid='rango_category_page_invalidate')
+def invalidate_category_page(sender, instance, **kwargs):
+    transaction.on_commit(functools.partial(category_page_cache.invalidate,
+                                            instance.category_id))
+
+
+@receiver([post_save, post_delete], sender=Category,
+          dispatch_uid='rango_category_page_invalidate_category')
+def invalidate_category_page_of_category(sender, instance, **kwargs):
+    transaction.on_commit(functools.partial(category_page_cache.invalidate, instance.pk))
@@ -0,0 +1,139 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from tango_with_django.rango.models import Category
+from tango_with_django.rango.versions import bump_version, get_version
+
+# What the suggestion templates need from a category
+CategorySuggestion = namedtuple('CategorySuggestion', 'id name slug likes')
+
+
+def rank(suggestion):
+    return -suggestion.likes, suggestion.name.lower()
+
+
+class CategoryPrefixIndex(object):
+    """
+    An in-memory index of category names for prefix suggestions.
+
+    Names are kept lower-cased in a sorted list, so the categories
+    starting with a prefix are one bisect away. Each process holds its own
+    copy, tagged with the ``categories`` version number from the cache.
+    Category save/delete signals, once their transaction commits, update
+    the local copy, bump the version and publish a snapshot to the cache,
+    from which other processes reload instead of querying the database.
+    """
+    version_name = 'categories'
+    snapshot_key = 'rango:categories:prefix-index'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []
+        self._entries = {}
+        self._version = None
+        self._built = 0
+
+    @property
+    def max_age(self):
+        # Likes change without signals; rebuild now and then to rerank
+        return getattr(settings, 'RANGO_SUGGESTION_INDEX_MAX_AGE', 300)
+
+    def suggest(self, prefix, limit=8):
+        """
+        Return up to ``limit`` categories whose name starts with
+        ``prefix``, most liked first.
+        """
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        self.refresh()
+        with self._lock:
+            start = bisect_left(self._keys, (prefix,))
+            end = bisect_left(self._keys, (prefix + '\U0010ffff',))
+            matches = [self._entries[category_id]
+                       for _, category_id in self._keys[start:end]]
+        if limit:
+            return heapq.nsmallest(limit, matches, key=rank)
+        return sorted(matches, key=rank)
+
+    def refresh(self):
+        version = get_version(self.version_name)
+        if (version != self._version or
+                time.time() - self._built > self.max_age):
+            self.load(version)
+
+    def load(self, version):
+        snapshot = cache.get(self.snapshot_key)
+        if snapshot and snapshot[0] == version and \
+                time.time() - snapshot[1] < self.max_age:
+            built, rows = snapshot[1], snapshot[2]
+        else:
+            built = time.time()
+            rows = list(Category.objects.values_list(
+                'id', 'name', 'slug', 'likes'))
+            cache.set(self.snapshot_key, (version, built, rows), None)
+        with self._lock:
+            self._entries = dict((row[0], CategorySuggestion(*row))
+                                 for row in rows)
+            self._keys = sorted((c.name.lower(), c.id)
+                                for c in self._entries.values())
+            self._version = version
+            self._built = built
+
+    def _put(self, entry):
+        self._drop(entry.id)
+        self._entries[entry.id] = entry
+        insort(self._keys, (entry.name.lower(), entry.id))
+
+    def _drop(self, category_id):
+        old = self._entries.pop(category_id, None)
+        if old is not None:
+            self._keys.remove((old.name.lower(), old.id))
+
+    def _publish(self):
+        # Only publish if no other process changed categories since we
+        # loaded; otherwise our copy is missing their change, so reload.
+        version = bump_version(self.version_name)
+        with self._lock:
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+                rows = [tuple(entry) for entry in self._entries.values()]
+                cache.set(self.snapshot_key, (version, self._built, rows), None)
+            else:
+                self._version = None
+
+    def update(self, category):
+        """Add or replace ``category`` (a Category or CategorySuggestion)."""
+        with self._lock:
+            self._put(CategorySuggestion(category.id, category.name,
+                                         category.slug, category.likes))
+        self._publish()
+
+    def remove(self, category_id):
+        with self._lock:
+            self._drop(category_id)
+        self._publish()
+
+    def set_likes(self, category_id, likes):
+        """Rerank a category locally after a like; not published."""
+        with self._lock:
+            entry = self._entries.get(category_id)
+            if entry is not None:
+                self._entries[category_id] = entry._replace(likes=likes)
+
+    def clear(self):
+        """Forget the local copy; the next suggestion reloads it."""
+        with self._lock:
+            self._keys = []
+            self._entries = {}
+            self._version = None
+            self._built = 0
+
+
+category_index = CategoryPrefixIndex()
@@ -1,10 +1,14 @@
 from django import template
+from django.utils.safestring import mark_safe
 
-from tango_with_django.rango.models import Category
+from tango_with_django.rango.sidebar import category_sidebar
 
 register = template.Library()
 
-@register.inclusion_tag('rango/cats.html')
+
+@register.simple_tag
 def get_category_list(cat=None):
-    return {'cats': Category.objects.all(),
-            'act_cat': cat}
+    """
+    Render the category sidebar (rango/cats.html), cached; see sidebar.py.
+    """
+    return mark_safe(category_sidebar.render(cat))
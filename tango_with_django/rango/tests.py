@@ -1,11 +1,58 @@
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 import pytz
 
+from django.conf import settings
 from django.utils import timezone
-from django.test import TestCase
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.cache import cache
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.models import Session
+from django.db import DatabaseError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 
-from tango_with_django.rango.models import Category, Page
+from tango_with_django.rango.models import Category, Page, UserProfile
+from tango_with_django.rango.view_counter import page_view_counter
+from tango_with_django.rango.page_urls import page_url_cache
+from tango_with_django.rango.likes import add_like
+from tango_with_django.rango.bulk_pages import bulk_add_pages
+from tango_with_django.rango.suggestions import category_index
+from tango_with_django.rango.leaderboards import category_leaderboard, page_leaderboard
+from tango_with_django.rango.webhose_client import WebhoseClient, WebhoseError, webhose_client
+from tango_with_django.rango.templatetags.rango_template_tags import get_category_list
+from tango_with_django.rango.sidebar import category_sidebar
+from tango_with_django.rango.query_plans import explain, full_scans
+from tango_with_django.rango.metrics import registry
+from tango_with_django.rango.category_cache import category_page_cache
+from tango_with_django.rango.visits import today, visit_counter
+from tango_with_django.rango.export import CSV_COLUMNS, export
+from tango_with_django.rango.ratelimit import RateLimiter, rate_limiter
+from tango_with_django.rango.loader import READERS, RangoLoader
+from tango_with_django.contrib.sessions.write_behind import (
+    SessionStore as WriteBehindStore, local_sessions, session_writer)
+from tango_with_django.users.models import User
+
+
+def run_on_commit_callbacks():
+    """
+    Run the transaction.on_commit() callbacks queued so far, which the
+    transaction wrapping each TestCase test would otherwise drop.
+    """
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
 
 
 class CategoryMethodTests(TestCase):
@@ -32,6 +79,9 @@ class CategoryMethodTests(TestCase):
 
 class IndexViewTests(TestCase):
 
+    def setUp(self):
+        cache.clear()
+
     def test_index_view_with_no_category(self):
         """
         If no questions exist, an appropriate message should be displayed
@@ -74,3 +124,1164 @@ class IndexViewTests(TestCase):
         self.assertEqual((page.last_visit <= datetime.now()), True)
         self.assertEqual((aware_last_visit >= page.first_visit), True)
       
+
+
+class TrackUrlViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        page_url_cache.local.clear()
+        self.category = Category.objects.create(name='track')
+        self.page = Page.objects.create(category=self.category, title='t',
+                                        url='http://example.com/')
+
+    def test_goto_redirects_without_writing_views(self):
+        """
+        A click is buffered: the redirect works and Page.views is only
+        updated once the buffer is flushed
+        """
+        for _ in range(3):
+            response = self.client.get(reverse('rango:goto'),
+                                       {'page_id': self.page.id})
+            self.assertRedirects(response, 'http://example.com/',
+                                 fetch_redirect_response=False)
+        self.page.refresh_from_db()
+        self.assertEqual(self.page.views, 0)
+        self.assertEqual(page_view_counter.pending(), {self.page.id: 3})
+        self.assertEqual(page_view_counter.flush(), 3)
+        self.page.refresh_from_db()
+        self.assertEqual(self.page.views, 3)
+        self.assertEqual(page_view_counter.pending(), {})
+
+    def test_clicks_after_flush_are_kept(self):
+        page_view_counter.record(self.page.id)
+        page_view_counter.flush()
+        page_view_counter.record(self.page.id, 2)
+        page_view_counter.flush()
+        self.page.refresh_from_db()
+        self.assertEqual(self.page.views, 3)
+
+    def test_goto_uses_cached_url(self):
+        """
+        Once a page's URL is cached the redirect needs no database query,
+        and saving the page invalidates the cached URL
+        """
+        url = reverse('rango:goto')
+        self.client.get(url, {'page_id': self.page.id})
+        with self.assertNumQueries(0):
+            self.client.get(url, {'page_id': self.page.id})
+        self.page.url = 'http://example.org/'
+        self.page.save()
+        run_on_commit_callbacks()
+        response = self.client.get(url, {'page_id': self.page.id})
+        self.assertRedirects(response, 'http://example.org/',
+                             fetch_redirect_response=False)
+
+    def test_goto_unknown_page(self):
+        response = self.client.get(reverse('rango:goto'), {'page_id': 999})
+        self.assertRedirects(response, '/rango/',
+                             fetch_redirect_response=False)
+
+
+class LikeCategoryTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='liked', likes=5)
+
+    def test_add_like_returns_new_total(self):
+        self.assertEqual(add_like(self.category.id), 6)
+        self.assertEqual(add_like(self.category.id), 7)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.likes, 7)
+
+    def test_add_like_missing_category(self):
+        self.assertIsNone(add_like(self.category.id + 1))
+
+    def test_like_view(self):
+        user = User.objects.create_user('liker', password='secret')
+        self.client.force_login(user)
+        response = self.client.get(reverse('rango:like_category'),
+                                   {'category_id': self.category.id})
+        self.assertContains(response, '6 people like this category')
+
+
+class PageSearchTests(TestCase):
+
+    def setUp(self):
+        python = Category.objects.create(name='Python')
+        web = Category.objects.create(name='Web Frameworks')
+        Page.objects.create(category=python, title='Official Python Tutorial',
+                            url='http://docs.python.org/tutorial/')
+        Page.objects.create(category=web, title='Flask',
+                            url='http://flask.pocoo.org/')
+        Page.objects.create(category=web, title='Bottle',
+                            url='http://bottlepy.org/docs/')
+        self.user = User.objects.create_user('searcher', password='secret')
+        self.client.force_login(self.user)
+
+    def search(self, query, **params):
+        params['query'] = query
+        response = self.client.get(reverse('rango:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return [page.title for page in response.context['result_list']]
+
+    def test_search_title(self):
+        self.assertEqual(self.search('tutorial'), ['Official Python Tutorial'])
+
+    def test_search_url_and_category(self):
+        self.assertEqual(self.search('pocoo'), ['Flask'])
+        self.assertEqual(sorted(self.search('frameworks')), ['Bottle', 'Flask'])
+
+    def test_search_is_paginated(self):
+        with self.settings(RANGO_SEARCH_RESULTS_PER_PAGE=1):
+            first = self.search('frameworks')
+            second = self.search('frameworks', page=2)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first, second)
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self.search('"flask OR ('), ['Flask'])
+
+
+class SuggestCategoryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category_index.clear()
+        # The index outlives the transaction these categories are rolled
+        # back with, so don't leave them in it for later tests
+        self.addCleanup(category_index.clear)
+        for name, likes in [('Python', 10), ('Pascal', 30), ('Perl', 20),
+                            ('PHP', 5), ('Django', 50)]:
+            Category.objects.create(name=name, likes=likes)
+
+    def test_suggestions_ranked_by_likes(self):
+        names = [c.name for c in category_index.suggest('p', 3)]
+        self.assertEqual(names, ['Pascal', 'Perl', 'Python'])
+        self.assertEqual([c.name for c in category_index.suggest('PY')],
+                         ['Python'])
+        self.assertEqual(category_index.suggest('x'), [])
+
+    def test_suggestions_follow_category_changes(self):
+        category_index.suggest('p')
+        category = Category.objects.get(name='Perl')
+        category.name = 'Ruby'
+        category.save()
+        Category.objects.get(name='PHP').delete()
+        run_on_commit_callbacks()
+        with self.assertNumQueries(0):
+            names = [c.name for c in category_index.suggest('p')]
+        self.assertEqual(names, ['Pascal', 'Python'])
+        self.assertEqual([c.name for c in category_index.suggest('r')],
+                         ['Ruby'])
+
+    def test_rolled_back_changes_are_not_indexed(self):
+        category_index.suggest('p')
+        try:
+            with transaction.atomic():
+                Category.objects.create(name='Pike')
+                raise DatabaseError
+        except DatabaseError:
+            pass
+        run_on_commit_callbacks()
+        self.assertEqual([c.name for c in category_index.suggest('pi')], [])
+
+    def test_suggest_view_needs_no_queries(self):
+        category_index.suggest('p')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('rango:suggest_category'),
+                                       {'suggestion': 'pe'})
+        self.assertContains(response, 'Perl')
+        self.assertNotContains(response, 'Python')
+
+    def test_suggest_json_says_when_complete(self):
+        url = reverse('rango:suggest_category')
+        data = self.client.get(url, {'suggestion': 'p', 'format': 'json'}).json()
+        self.assertEqual([c['name'] for c in data['results']],
+                         ['Pascal', 'Perl', 'Python', 'PHP'])
+        self.assertTrue(data['complete'])
+        self.assertEqual(data['results'][0]['url'],
+                         reverse('rango:show_category', args=['pascal']))
+        for i in range(6):
+            Category.objects.create(name='Pike {}'.format(i))
+        run_on_commit_callbacks()
+        data = self.client.get(url, {'suggestion': 'p', 'format': 'json'}).json()
+        self.assertEqual(len(data['results']), 8)
+        self.assertFalse(data['complete'])
+
+    def test_suggest_is_publicly_cacheable(self):
+        url = reverse('rango:suggest_category')
+        response = self.client.get(url, {'suggestion': 'pe'})
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=60', response['Cache-Control'])
+        not_modified = self.client.get(url, {'suggestion': 'pe'},
+                                       HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        Category.objects.create(name='Perlite')
+        run_on_commit_callbacks()
+        changed = self.client.get(url, {'suggestion': 'pe'},
+                                  HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+
+
+class CategorySidebarTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for i in range(5):
+            Category.objects.create(name='cat {}'.format(i), likes=i)
+
+    def test_sidebar_is_capped_and_cached(self):
+        with self.settings(RANGO_SIDEBAR_CATEGORIES=3):
+            with self.assertNumQueries(2):
+                html = get_category_list()
+            self.assertIn('cat 4', html)
+            self.assertNotIn('cat 1', html)
+            self.assertIn('2 more', html)
+            with self.assertNumQueries(0):
+                self.assertEqual(get_category_list(), html)
+
+    def test_sidebar_invalidated_on_category_change(self):
+        get_category_list()
+        Category.objects.create(name='brand new')
+        run_on_commit_callbacks()
+        self.assertIn('brand new', get_category_list())
+
+    def test_sidebar_follows_likes(self):
+        get_category_list()
+        self.client.force_login(User.objects.create_user('liker', password='secret'))
+        category = Category.objects.get(name='cat 0')
+        self.client.get(reverse('rango:like_category'), {'category_id': category.id})
+        self.client.get(reverse('rango:like_category'), {'category_id': category.id})
+        run_on_commit_callbacks()
+        html = get_category_list()
+        self.assertLess(html.index('cat 0'), html.index('cat 1'))
+
+    def test_like_that_keeps_the_order_keeps_the_cache(self):
+        get_category_list()
+        stamp = category_sidebar.stamp()
+        add_like(Category.objects.get(name='cat 4').id, 5)
+        category_sidebar.update_likes(Category.objects.get(name='cat 4').id, 9)
+        self.assertEqual(category_sidebar.stamp(), stamp)
+        self.assertEqual(category_sidebar.get()[0][0].likes, 9)
+        category_sidebar.update_likes(Category.objects.get(name='cat 3').id, 10)
+        self.assertNotEqual(category_sidebar.stamp(), stamp)
+
+
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for i in range(7):
+            Category.objects.create(name='board {}'.format(i), likes=i * 10)
+
+    def test_top_categories_cached(self):
+        names = [c.name for c in category_leaderboard.top()]
+        self.assertEqual(names, ['board 6', 'board 5', 'board 4',
+                                 'board 3', 'board 2'])
+        with self.assertNumQueries(0):
+            category_leaderboard.top()
+
+    def test_likes_update_the_board(self):
+        category_leaderboard.top()
+        first = Category.objects.get(name='board 5')
+        category_leaderboard.update_score(first.id, add_like(first.id, 100))
+        with self.assertNumQueries(0):
+            top = category_leaderboard.top()
+        self.assertEqual((top[0].name, top[0].likes), ('board 5', 150))
+
+        outsider = Category.objects.get(name='board 0')
+        category_leaderboard.update_score(outsider.id, add_like(outsider.id, 500))
+        self.assertEqual(category_leaderboard.top()[0].name, 'board 0')
+
+    def test_flushed_views_update_page_board(self):
+        category = Category.objects.get(name='board 0')
+        pages = [Page.objects.create(category=category, title=str(i),
+                                     url='http://example.com/{}'.format(i))
+                 for i in range(2)]
+        page_leaderboard.top()
+        page_view_counter.record(pages[1].id)
+        page_view_counter.flush()
+        self.assertEqual(page_leaderboard.top()[0], pages[1])
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubWebhoseHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        time.sleep(self.delay)
+        body = json.dumps({'posts': [
+            {'title': 'Result', 'url': 'http://example.com/', 'text': 'x' * 300},
+        ]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhoseClientTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(WebhoseClientTests, cls).setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubWebhoseHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = 'http://127.0.0.1:{}/filterWebContent'.format(
+            cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super(WebhoseClientTests, cls).tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        StubWebhoseHandler.requests = []
+        StubWebhoseHandler.delay = 0
+        self.webhose = WebhoseClient(root_url=self.url, api_key='key', timeout=1)
+
+    def test_results_are_parsed_and_cached(self):
+        results = self.webhose.search('Django  Tango')
+        self.assertEqual(results, [{'title': 'Result',
+                                    'link': 'http://example.com/',
+                                    'summary': 'x' * 222}])
+        self.assertEqual(self.webhose.search('django tango'), results)
+        self.assertEqual(len(StubWebhoseHandler.requests), 1)
+        self.assertIn('token=key', StubWebhoseHandler.requests[0])
+
+    def test_connection_is_reused(self):
+        self.webhose.search('one')
+        self.webhose.search('two')
+        self.assertEqual(self.webhose._pool.qsize(), 1)
+
+    def test_concurrent_queries_are_coalesced(self):
+        StubWebhoseHandler.delay = 0.2
+        threads = [threading.Thread(target=self.webhose.search, args=('same',))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(StubWebhoseHandler.requests), 1)
+
+    def test_failed_shared_request_fails_followers(self):
+        started = threading.Event()
+        errors = []
+
+        def fail():
+            started.set()
+            time.sleep(0.2)
+            raise ValueError('boom')
+
+        def follow():
+            started.wait()
+            try:
+                errors.append(self.webhose._coalesce('key', lambda: 'own result'))
+            except WebhoseError as e:
+                errors.append(e)
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+        with self.assertRaises(ValueError):
+            self.webhose._coalesce('key', fail)
+        follower.join()
+        self.assertIsInstance(errors[0], WebhoseError)
+        self.assertIn('boom', str(errors[0]))
+
+    def test_submit_and_poll(self):
+        StubWebhoseHandler.delay = 0.2
+        token = self.webhose.submit('background')
+        self.assertEqual(self.webhose.poll(token), WebhoseClient.PENDING)
+        self.assertNotEqual(token, self.webhose.make_token('background', 8))
+        other = self.webhose.submit('Background')
+        self.assertNotEqual(other, token)
+        for _ in range(50):
+            results = self.webhose.poll(token)
+            if results != WebhoseClient.PENDING:
+                break
+            time.sleep(0.05)
+        self.assertEqual(results[0]['title'], 'Result')
+        self.assertEqual(self.webhose.poll(other), results)
+        self.assertEqual(len(StubWebhoseHandler.requests), 1)
+        self.assertIsNone(self.webhose.poll('0' * 32))
+
+    def test_failed_job_is_reported_not_cached(self):
+        webhose = WebhoseClient(root_url='http://127.0.0.1:1/', api_key='key', timeout=1)
+        token = webhose.submit('unreachable')
+        for _ in range(50):
+            results = webhose.poll(token)
+            if results != WebhoseClient.PENDING:
+                break
+            time.sleep(0.05)
+        self.assertEqual(results, WebhoseClient.FAILED)
+        self.assertIsNone(cache.get(webhose.make_key(webhose.make_token('unreachable', 8))))
+
+    def test_timeout_gives_no_results(self):
+        StubWebhoseHandler.delay = 1.5
+        self.assertEqual(self.webhose.search('slow'), [])
+        self.assertIsNone(cache.get(
+            self.webhose.make_key(self.webhose.make_token('slow', 8))))
+
+
+class AsyncSearchViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='async')
+        self.token = 'f' * 32
+        self.query_token = webhose_client.make_token('tango', 8)
+        cache.set(webhose_client.job_key(self.token), self.query_token)
+
+    def poll(self):
+        return self.client.get(
+            reverse('rango:search_results', args=[self.token]),
+            {'category_id': self.category.id})
+
+    def test_poll_pending_and_done(self):
+        self.assertEqual(self.poll().status_code, 404)
+        cache.set(webhose_client.run_key(self.query_token), WebhoseClient.PENDING)
+        self.assertEqual(self.poll().status_code, 202)
+        cache.set(webhose_client.run_key(self.query_token),
+                  [{'title': 'Tango', 'link': 'http://example.com/',
+                    'summary': ''}])
+        response = self.poll()
+        self.assertContains(response, 'Tango')
+        self.assertContains(response, 'data-catid="{}"'.format(self.category.id))
+
+    def test_poll_failed(self):
+        cache.set(webhose_client.run_key(self.query_token), WebhoseClient.FAILED)
+        self.assertContains(self.poll(), 'search failed', status_code=502)
+
+    def test_cached_results_render_immediately(self):
+        cache.set(webhose_client.make_key(self.query_token),
+                  [{'title': 'Cached hit', 'link': 'http://example.com/',
+                    'summary': ''}])
+        with self.settings(RANGO_ASYNC_SEARCH=True):
+            response = self.client.post(
+                reverse('rango:show_category', args=[self.category.slug]),
+                {'query': 'Tango'})
+        self.assertContains(response, 'Cached hit')
+        self.assertNotContains(response, 'data-poll-url')
+
+
+class LoadRangoTests(TestCase):
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def test_load_json_is_idempotent(self):
+        path = self.write('rango.json', json.dumps([
+            {'name': 'Python', 'views': 128, 'likes': 64, 'pages': [
+                {'title': 'Tutorial', 'url': 'http://docs.python.org/', 'views': 10},
+                {'title': 'PEP 8', 'url': 'http://pep8.org/'},
+            ]},
+        ]))
+        call_command('load_rango', path, stdout=io.StringIO())
+        call_command('load_rango', path, stdout=io.StringIO())
+        category = Category.objects.get()
+        self.assertEqual((category.slug, category.likes), ('python', 64))
+        self.assertEqual(
+            sorted(Page.objects.values_list('title', 'views')),
+            [('PEP 8', 0), ('Tutorial', 10)])
+
+    def test_load_csv_and_jsonl_update_existing_rows(self):
+        csv_path = self.write('rango.csv',
+                              'category,category_likes,title,url,views\n'
+                              'Django,3,Docs,http://djangoproject.com/,5\n')
+        jsonl_path = self.write('more.jsonl',
+                                '{"name": "Django", "likes": 7}\n'
+                                '{"category": "Django", "title": "Docs", '
+                                '"url": "http://djangoproject.com/", "views": 9}\n'
+                                '{"category": "Flask", "title": "Flask", '
+                                '"url": "http://flask.pocoo.org/"}\n')
+        out = io.StringIO()
+        call_command('load_rango', csv_path, jsonl_path, batch_size=2, stdout=out)
+        self.assertIn('5 records', out.getvalue())
+        self.assertEqual(Category.objects.get(name='Django').likes, 7)
+        self.assertEqual(Page.objects.get(title='Docs').views, 9)
+        self.assertEqual(Page.objects.count(), 2)
+
+
+class ProfileListTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.viewer = User.objects.create_user('viewer', password='secret')
+        self.client.force_login(self.viewer)
+
+    def test_list_profiles_query_count_and_pages(self):
+        for i in range(5):
+            user = User.objects.create_user('user{}'.format(i))
+            UserProfile.objects.create(user=user)
+        url = reverse('rango:list_profiles')
+        with self.settings(RANGO_PROFILES_PER_PAGE=3):
+            self.client.get(url)  # fill the sidebar cache
+            # savepoint, session, viewer, profiles with their users, release
+            with self.assertNumQueries(5):
+                response = self.client.get(url)
+            names = [p.user.username for p in response.context['userprofile_list']]
+            self.assertEqual(names, ['user0', 'user1', 'user2'])
+            response = self.client.get(url, {'after': response.context['next_after']})
+        names = [p.user.username for p in response.context['userprofile_list']]
+        self.assertEqual(names, ['user3', 'user4'])
+        self.assertIsNone(response.context['next_after'])
+
+
+@override_settings(RANGO_IMAGE_WORKERS=0)
+class ProfileImageTests(TransactionTestCase):
+    # on_commit() callbacks only run when a transaction really commits
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user('pictured', password='secret')
+        self.client.force_login(self.user)
+
+    def upload(self, name):
+        from PIL import Image
+        output = io.BytesIO()
+        Image.new('RGB', (600, 400), 'red').save(output, format='PNG')
+        output.name = name
+        output.seek(0)
+        return self.client.post(
+            reverse('rango:profile', args=[self.user.username]),
+            {'website': '', 'picture': output})
+
+    def test_upload_makes_derivatives(self):
+        from PIL import Image
+        self.upload('me.png')
+        profile = UserProfile.objects.get(user=self.user)
+        derivatives = profile.get_derivatives()
+        self.assertTrue(profile.images_ready)
+        self.assertEqual(set(derivatives), {'thumbnail', 'display'})
+        for label, size in UserProfile.DERIVATIVE_SIZES:
+            for format, name in derivatives[label].items():
+                self.assertIn('/derivatives/me_{}.'.format(label), name)
+                with Image.open(profile.picture.storage.path(name)) as image:
+                    self.assertEqual(image.size, size)
+                    self.assertEqual(image.format, format.upper())
+        self.assertTrue(profile.images['thumbnail']['jpeg'].endswith(
+            derivatives['thumbnail']['jpeg']))
+
+        response = self.client.get(reverse('rango:list_profiles'))
+        self.assertContains(response, profile.images['thumbnail']['jpeg'])
+
+    def test_new_picture_replaces_derivatives(self):
+        self.upload('first.png')
+        old = UserProfile.objects.get(user=self.user).get_derivatives()
+        self.upload('second.png')
+        profile = UserProfile.objects.get(user=self.user)
+        storage = profile.picture.storage
+        self.assertIn('second', profile.get_derivatives()['display']['jpeg'])
+        self.assertFalse(storage.exists(old['display']['jpeg']))
+
+
+class CategoryPagesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Paged')
+        # Ties on views check that the id tie-break keeps pages in order
+        for i in range(7):
+            Page.objects.create(category=self.category, title='page{}'.format(i),
+                                url='http://example.com/{}'.format(i),
+                                views=10 - i // 2)
+
+    def test_load_more_walks_all_pages_once(self):
+        titles = []
+        cursor = ''
+        with self.settings(RANGO_CATEGORY_PAGE_SIZE=3):
+            while cursor is not None:
+                response = self.client.get(
+                    reverse('rango:category_pages', args=[self.category.slug]),
+                    {'after': cursor})
+                titles += [page.title for page in response.context['pages']]
+                cursor = response.context['next_cursor']
+        self.assertEqual(titles, ['page{}'.format(i) for i in range(7)])
+        self.assertNotContains(response, 'Load more')
+
+    def test_category_page_shows_load_more(self):
+        with self.settings(RANGO_CATEGORY_PAGE_SIZE=3):
+            response = self.client.get(reverse('rango:show_category',
+                                               args=[self.category.slug]))
+        self.assertContains(response, 'page2')
+        self.assertNotContains(response, 'page3')
+        third = Page.objects.get(title='page2')
+        self.assertContains(response, 'Load more')
+        self.assertContains(response, '?after={}.{}'.format(third.views, third.id))
+
+    def test_bad_cursor(self):
+        for after in ('nonsense', '{}.1'.format(2 ** 63), '1.{}'.format(-2 ** 63 - 1)):
+            response = self.client.get(
+                reverse('rango:category_pages', args=[self.category.slug]),
+                {'after': after})
+            self.assertEqual(response.status_code, 404, after)
+
+
+class QueryPlanTests(TestCase):
+
+    def test_hot_queries_use_indexes(self):
+        out = io.StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertNotIn('FULL SCAN', out.getvalue())
+
+    def test_full_scan_is_reported(self):
+        plan = explain(Page.objects.filter(title='unindexed'))
+        self.assertTrue(full_scans(plan))
+
+
+@override_settings(RANGO_METRICS_ENABLED=True, RANGO_METRICS_TOKEN='s3cret')
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.category = Category.objects.create(name='Measured')
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('rango:show_category',
+                                           args=[self.category.slug]))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(timing, r'cache;desc="\d+ hits, [1-9]\d* misses"')
+        self.assertRegex(timing, r'tpl;dur=[\d.]+, total;dur=[\d.]+')
+        stats = registry.snapshot()['rango:show_category']
+        self.assertEqual(stats['count'], 1)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(stats['template_time'], 0)
+
+    def test_metrics_endpoint_is_restricted(self):
+        url = reverse('rango:metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertContains(
+            response, 'rango_request_duration_seconds_count{view="rango:metrics"} 2')
+
+        staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(url)
+        self.assertContains(response, '# TYPE rango_db_queries_total counter')
+
+    @override_settings(RANGO_METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('rango:about'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class CategoryPageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Cached')
+        self.page = Page.objects.create(category=self.category, title='First',
+                                        url='http://example.com/first/')
+        self.url = reverse('rango:show_category', args=[self.category.slug])
+        self.client.get(self.url)
+
+    def test_served_from_cache(self):
+        # session-less anonymous request: no queries at all
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'First')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_page_changes_invalidate(self):
+        Page.objects.create(category=self.category, title='Second',
+                            url='http://example.com/second/')
+        run_on_commit_callbacks()
+        self.assertContains(self.client.get(self.url), 'Second')
+        self.page.delete()
+        run_on_commit_callbacks()
+        self.assertNotContains(self.client.get(self.url), 'First')
+
+    def test_like_and_flush_invalidate(self):
+        user = User.objects.create_user('fan', password='secret')
+        self.client.force_login(user)
+        self.client.get(reverse('rango:like_category'),
+                        {'category_id': self.category.id})
+        run_on_commit_callbacks()
+        self.assertContains(self.client.get(self.url),
+                            '<strong>1</strong> people like this category')
+        page_view_counter.record(self.page.id, 3)
+        page_view_counter.flush()
+        self.assertContains(self.client.get(self.url), '3 views')
+
+    def test_rename_and_missing_slug(self):
+        self.category.name = 'Renamed'
+        self.category.save()
+        run_on_commit_callbacks()
+        self.assertContains(self.client.get(self.url), 'does not exist')
+        self.assertContains(self.client.get(
+            reverse('rango:show_category', args=['renamed'])), 'First')
+        self.assertIsNone(category_page_cache.get('no-such-category'))
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Validated')
+        self.url = reverse('rango:show_category', args=[self.category.slug])
+        run_on_commit_callbacks()
+
+    def revalidate(self, url, response, **extra):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **extra)
+
+    def test_category_not_modified_until_changed(self):
+        # The first response sets the CSRF cookie the ETag depends on
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        not_modified = self.revalidate(self.url, response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        Page.objects.create(category=self.category, title='New',
+                            url='http://example.com/new/')
+        run_on_commit_callbacks()
+        self.assertEqual(self.revalidate(self.url, response).status_code, 200)
+
+    def test_etag_varies_by_user(self):
+        response = self.client.get(self.url)
+        self.client.force_login(User.objects.create_user('other', password='secret'))
+        self.assertEqual(self.revalidate(self.url, response).status_code, 200)
+
+    def test_index_and_about(self):
+        for name in ('rango:index', 'rango:about'):
+            url = reverse(name)
+            response = self.client.get(url)
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+            Category.objects.create(name='Another {}'.format(name))
+            run_on_commit_callbacks()
+            self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_reordering_like_changes_every_page_with_the_sidebar(self):
+        Category.objects.create(name='Other', likes=1)
+        run_on_commit_callbacks()
+        self.client.force_login(User.objects.create_user('liker', password='secret'))
+        urls = [reverse('rango:index'), reverse('rango:about'), self.url]
+        # The first response sets the CSRF cookie the ETag depends on
+        self.client.get(self.url)
+        responses = [self.client.get(url) for url in urls]
+        for url, response in zip(urls, responses):
+            self.assertEqual(self.revalidate(url, response).status_code, 304, url)
+        like = reverse('rango:like_category')
+        # Level with Other, which still sorts first by name
+        self.client.get(like, {'category_id': self.category.id})
+        run_on_commit_callbacks()
+        about = self.revalidate(urls[1], responses[1])
+        self.assertEqual(about.status_code, 304)
+        self.client.get(like, {'category_id': self.category.id})
+        run_on_commit_callbacks()
+        for url, response in zip(urls, responses):
+            self.assertEqual(self.revalidate(url, response).status_code, 200, url)
+
+
+class VisitCounterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('rango:index')
+
+    def test_first_visit_sets_cookie_once_a_day(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['visits'], '1st')
+        self.assertIn(visit_counter.cookie_name, response.cookies)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['visits'], '1st')
+        # Nothing written: no visits cookie and no session
+        self.assertNotIn(visit_counter.cookie_name, response.cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def cookie(self, visits, day):
+        response = HttpResponse()
+        visit_counter.remember(response, visits, day)
+        return response.cookies[visit_counter.cookie_name].value
+
+    def test_new_day_counts(self):
+        self.client.cookies[visit_counter.cookie_name] = self.cookie(3, today() - 1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['visits'], '4th')
+        self.assertIn(visit_counter.cookie_name, response.cookies)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['visits'], '4th')
+        self.assertNotIn(visit_counter.cookie_name, response.cookies)
+
+    def test_tampered_cookie_starts_over(self):
+        self.client.cookies[visit_counter.cookie_name] = '9:{}:forged'.format(today())
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['visits'], '1st')
+
+
+class WriteBehindSessionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        engine = override_settings(
+            SESSION_ENGINE='tango_with_django.contrib.sessions.write_behind',
+            SESSION_WRITE_BEHIND_INTERVAL=60 * 60)
+        engine.enable()
+        self.addCleanup(engine.disable)
+        local_sessions.clear()
+        session_writer.flush()
+        store = WriteBehindStore()
+        store['visits'] = 1
+        store.create()
+        self.key = store.session_key
+
+    def tearDown(self):
+        # Not left for the exit-time flush, after the test database is gone
+        session_writer.flush()
+
+    def stored(self):
+        return Session.objects.get(session_key=self.key).get_decoded()
+
+    def test_updates_written_behind(self):
+        store = WriteBehindStore(self.key)
+        store['visits'] = 2
+        store.save()
+        self.assertEqual(self.stored()['visits'], 1)
+        local_sessions.clear()
+        self.assertEqual(WriteBehindStore(self.key)['visits'], 2)
+
+        self.assertEqual(session_writer.flush(), 1)
+        self.assertEqual(self.stored()['visits'], 2)
+
+    def test_reads_from_database_when_cache_is_lost(self):
+        cache.clear()
+        local_sessions.clear()
+        self.assertEqual(WriteBehindStore(self.key)['visits'], 1)
+
+    def test_deleted_session_not_brought_back(self):
+        store = WriteBehindStore(self.key)
+        store['visits'] = 2
+        store.save()
+        # Deleted by another process, which leaves our queue alone
+        Session.objects.filter(session_key=self.key).delete()
+        self.assertEqual(session_writer.flush(), 0)
+        local_sessions.clear()
+        self.assertFalse(Session.objects.filter(session_key=self.key).exists())
+        self.assertNotIn('visits', WriteBehindStore(self.key))
+
+    @override_settings(SESSION_WRITE_BEHIND_INTERVAL=0)
+    def test_inline_update_of_deleted_session(self):
+        store = WriteBehindStore(self.key)
+        store['visits'] = 2
+        Session.objects.filter(session_key=self.key).delete()
+        with self.assertRaises(UpdateError):
+            store.save()
+
+    def test_login_is_written_through(self):
+        store = WriteBehindStore(self.key)
+        store['_auth_user_id'] = '1'
+        store.save()
+        self.assertEqual(self.stored()['_auth_user_id'], '1')
+        self.assertEqual(session_writer.pending(), 0)
+
+    def test_cycled_key_is_written_through(self):
+        store = WriteBehindStore(self.key)
+        store.cycle_key()
+        store['visits'] = 2
+        store.save()
+        self.assertEqual(Session.objects.get(session_key=store.session_key)
+                         .get_decoded()['visits'], 2)
+        self.assertFalse(Session.objects.filter(session_key=self.key).exists())
+
+    def test_deletion_reaches_other_workers(self):
+        WriteBehindStore(self.key).delete()
+        # A copy another worker read before the logout: reads keep using it
+        # until it expires, but it cannot be saved back
+        local_sessions.set(self.key, {'visits': 1})
+        store = WriteBehindStore(self.key)
+        self.assertEqual(store['visits'], 1)
+        store['visits'] = 2
+        with self.assertRaises(UpdateError):
+            store.save()
+        local_sessions.clear()
+        self.assertNotIn('visits', WriteBehindStore(self.key))
+
+    def test_save_after_concurrent_delete(self):
+        store = WriteBehindStore(self.key)
+        store['visits'] = 2
+        WriteBehindStore(self.key).delete()
+        with self.assertRaises(UpdateError):
+            store.save()
+
+    def test_logged_in_requests_skip_session_table(self):
+        self.client.force_login(User.objects.create_user('sessions', password='secret'))
+        self.client.get(reverse('rango:about'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('rango:about'))
+        self.assertFalse([q for q in queries if 'django_session' in q['sql']])
+
+
+class BulkAddPagesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Bulk')
+        Page.objects.create(category=self.category, title='Existing',
+                            url='http://example.com/existing/')
+        self.url = reverse('rango:add_pages', args=[self.category.slug])
+        self.client.force_login(User.objects.create_user('adder', password='secret'))
+
+    def post(self, pages):
+        return self.client.post(self.url, json.dumps({'pages': pages}),
+                                content_type='application/json')
+
+    def test_adds_only_new_pages(self):
+        # Warm the category page cache to check it is invalidated
+        self.client.get(reverse('rango:show_category', args=[self.category.slug]))
+        response = self.post([
+            {'title': 'Existing again', 'url': 'http://example.com/existing/'},
+            {'title': 'One', 'url': 'http://example.com/one/'},
+            {'title': 'One again', 'url': 'http://example.com/one/'},
+            {'title': 'Two', 'url': 'https://example.com/two/'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([page.title for page in response.context['pages']], ['One', 'Two'])
+        self.assertNotContains(response, 'Existing')
+        self.assertNotContains(response, '<ul>')
+        page = Page.objects.get(url='https://example.com/two/')
+        self.assertContains(response, '?page_id={}"'.format(page.pk))
+        self.assertEqual(Page.objects.filter(category=self.category).count(), 3)
+        self.assertGreater(page.last_visit, page.first_visit.replace(year=2000))
+
+        run_on_commit_callbacks()
+        response = self.client.get(reverse('rango:show_category', args=[self.category.slug]))
+        self.assertContains(response, '>Two</a>')
+
+        # Adding the same batch again adds nothing
+        response = self.post([{'title': 'One', 'url': 'http://example.com/one/'}])
+        self.assertEqual(list(response.context['pages']), [])
+
+    def test_new_page_id_cached_as_missing(self):
+        page, = bulk_add_pages(self.category, [('New', 'http://example.com/new/')])
+        # As cached by a reader before the commit, or for a deleted page
+        # whose id SQLite reused
+        cache.set(page_url_cache.make_key(page.id), '')
+        run_on_commit_callbacks()
+        self.assertRedirects(self.client.get(reverse('rango:goto'), {'page_id': page.id}),
+                             'http://example.com/new/', fetch_redirect_response=False)
+
+    def test_invalid_batch_adds_nothing(self):
+        response = self.post([
+            {'title': 'One', 'url': 'http://example.com/one/'},
+            {'title': 'Bad', 'url': 'not a url'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post('nope').status_code, 400)
+        self.assertEqual(self.client.post(self.url, 'nope', content_type='application/json').status_code, 400)
+        self.assertEqual(Page.objects.filter(category=self.category).count(), 1)
+
+    def test_requires_post_and_login(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.post([]).status_code, 302)
+
+    def test_add_page_form_rejects_duplicate_url(self):
+        response = self.client.post(
+            reverse('rango:add_page', args=[self.category.slug]),
+            {'title': 'Again', 'url': 'http://example.com/existing/', 'views': 0,
+             'last_visit': '2018-01-01 00:00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'url', 'This page is already in the category.')
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category_index.clear()
+        self.category = Category.objects.create(name='Api', likes=3)
+        Category.objects.create(name='Apiary', likes=5)
+        Category.objects.create(name='Other')
+        for i in range(5):
+            Page.objects.create(category=self.category, title='page{}'.format(i),
+                                url='http://example.com/{}/'.format(i), views=10 - i)
+
+    def get(self, name, args=(), **params):
+        response = self.client.get(reverse('rango:' + name, args=args), params)
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        return response.status_code, json.loads(content.decode('utf-8'))
+
+    def test_cursor_walks_all_rows_once(self):
+        ids = []
+        params = {'limit': 2, 'fields': 'id'}
+        while True:
+            status, data = self.get('api_categories', **params)
+            self.assertEqual(status, 200)
+            ids += [row['id'] for row in data['results']]
+            if data['next'] is None:
+                break
+            params['after'] = data['next']
+        self.assertEqual(ids, list(Category.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_category_pages_by_views_with_fields(self):
+        with self.assertNumQueries(2):
+            status, data = self.get('api_category_pages', [self.category.slug],
+                                    fields='title,views', limit=3)
+        self.assertEqual(data['results'], [{'title': 'page0', 'views': 10},
+                                           {'title': 'page1', 'views': 9},
+                                           {'title': 'page2', 'views': 8}])
+        status, data = self.get('api_category_pages', [self.category.slug],
+                                fields='title', after=data['next'])
+        self.assertEqual([row['title'] for row in data['results']], ['page3', 'page4'])
+        self.assertIsNone(data['next'])
+
+    def test_pages_default_fields(self):
+        status, data = self.get('api_pages', limit=1)
+        self.assertEqual(set(data['results'][0]), {
+            'id', 'category_id', 'title', 'url', 'views', 'first_visit', 'last_visit'})
+
+    def test_errors(self):
+        self.assertEqual(self.get('api_category_pages', ['missing'])[0], 404)
+        status, data = self.get('api_pages', fields='title,password')
+        self.assertEqual(status, 400)
+        self.assertIn('password', data['error'])
+        self.assertEqual(self.get('api_pages', after='x.y')[0], 400)
+        self.assertEqual(self.get('api_pages', after='{}.1'.format(2 ** 63))[0], 400)
+        self.assertEqual(self.get('api_pages', limit=0)[0], 400)
+        self.assertEqual(self.get('api_pages', limit='many')[0], 400)
+
+    def test_query_runs_before_streaming(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('rango:api_pages'))
+        self.assertTrue(response.streaming)
+        self.assertTrue([q for q in queries if 'rango_page' in q['sql']])
+
+    def test_top_lists_and_suggestions(self):
+        status, data = self.get('api_top_categories', fields='name,likes')
+        self.assertEqual(data['results'][:2], [{'name': 'Apiary', 'likes': 5},
+                                               {'name': 'Api', 'likes': 3}])
+        status, data = self.get('api_top_pages', fields='title')
+        self.assertEqual(data['results'][0], {'title': 'page0'})
+        status, data = self.get('api_suggest_categories', prefix='api', fields='slug')
+        self.assertEqual(data['results'], [{'slug': 'apiary'}, {'slug': 'api'}])
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for c in range(3):
+            category = Category.objects.create(name='Export {}'.format(c), views=c, likes=c * 2)
+            for p in range(3):
+                Page.objects.create(category=category, title='Page {}.{}'.format(c, p),
+                                    url='http://example.com/{}/{}/'.format(c, p), views=p)
+
+    def snapshot(self):
+        return (sorted(Category.objects.values_list('name', 'views', 'likes')),
+                sorted(Page.objects.values_list('category__name', 'title', 'url', 'views')))
+
+    def test_round_trip_through_load_rango(self):
+        for fmt in ('jsonl', 'csv'):
+            expected = self.snapshot()
+            # Small chunks, to cross several chunk boundaries
+            data = b''.join(export(fmt, chunk_size=2)).decode('utf-8')
+            Category.objects.all().delete()
+            RangoLoader().load(READERS[fmt](io.StringIO(data, newline='')))
+            self.assertEqual(self.snapshot(), expected)
+
+    def test_gzip_and_blocks(self):
+        plain = b''.join(export('jsonl'))
+        self.assertEqual(len(plain.splitlines()), 12)
+        blocks = list(export('jsonl', block_size=100))
+        self.assertGreater(len(blocks), 1)
+        self.assertEqual(b''.join(blocks), plain)
+        self.assertEqual(gzip.decompress(b''.join(export('jsonl', compress=True))), plain)
+
+    def test_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'rango.csv.gz')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command('export_rango', output=path, stderr=io.StringIO())
+        with gzip.open(path, 'rt') as f:
+            self.assertEqual(f.readline().strip(), ','.join(CSV_COLUMNS))
+
+    def test_admin_export_is_staff_only(self):
+        url = reverse('admin:rango_export')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'secret'))
+        response = self.client.get(url, {'format': 'csv', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.csv.gz', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(content.splitlines()), 13)
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 404)
+
+
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        rate_limiter.clear()
+        self.addCleanup(rate_limiter.clear)
+        limits = override_settings(RANGO_RATE_LIMIT_ENABLED=True,
+                                   RANGO_RATE_LIMITS={'suggest_category': (0.5, 3)})
+        limits.enable()
+        self.addCleanup(limits.disable)
+        self.url = reverse('rango:suggest_category')
+
+    def suggest(self, **extra):
+        return self.client.get(self.url, {'suggestion': 'py'}, **extra)
+
+    def test_burst_then_429(self):
+        for _ in range(3):
+            self.assertEqual(self.suggest().status_code, 200)
+        response = self.suggest()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+        # Other clients have their own buckets
+        self.assertEqual(self.suggest(REMOTE_ADDR='10.0.0.2').status_code, 200)
+        self.client.force_login(User.objects.create_user('limited', password='secret'))
+        self.assertEqual(self.suggest().status_code, 200)
+
+    def test_refill(self):
+        limiter = RateLimiter()
+        self.assertEqual(limiter._take_local('k', 2, 1, 100.0), (True, 0.0))
+        self.assertEqual(limiter._take_local('k', 2, 1, 100.25), (False, 0.25))
+        self.assertEqual(limiter._take_local('k', 2, 1, 100.5), (True, 0.0))
+
+    def test_forwarded_address(self):
+        with self.settings(RANGO_RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR'):
+            for _ in range(3):
+                self.suggest(HTTP_X_FORWARDED_FOR='1.1.1.1, 10.0.0.1')
+            self.assertEqual(self.suggest(HTTP_X_FORWARDED_FOR='1.1.1.1, 10.0.0.1').status_code, 429)
+            # Spoofed first entries do not get a fresh bucket
+            self.assertEqual(self.suggest(HTTP_X_FORWARDED_FOR='2.2.2.2, 10.0.0.1').status_code, 429)
+            self.assertEqual(self.suggest(HTTP_X_FORWARDED_FOR='10.0.0.9').status_code, 200)
@@ -1,7 +1,9 @@
 from django.conf.urls import url
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 
-from tango_with_django.rango import views
+from tango_with_django.rango import api, views
+from tango_with_django.rango.ratelimit import rate_limit
 
 app_name = 'rango'
 urlpatterns = [
@@ -9,20 +11,50 @@ urlpatterns = [
     url(r'^about/$', views.AboutView.as_view(), name='about'),
     url(r'^add_category/$', login_required(views.AddCategoryView.as_view()),
         name='add_category'),
+    # Served from cache; skip the ATOMIC_REQUESTS transaction
     url(r'^category/(?P<category_name_slug>[\w\-]+)/$',
-        views.ShowCategoryView.as_view(), name='show_category'),
+        transaction.non_atomic_requests(views.ShowCategoryView.as_view()),
+        name='show_category'),
+    url(r'^category/(?P<category_name_slug>[\w\-]+)/pages/$',
+        views.category_pages, name='category_pages'),
+    # Rate limits are (requests per second, burst) per user or address;
+    # RANGO_RATE_LIMITS overrides them by URL name. See ratelimit.py.
+    url(r'^category/(?P<category_name_slug>[\w\-]+)/add_pages/$',
+        rate_limit(views.add_pages, 1, 5), name='add_pages'),
     url(r'^category/(?P<category_name_slug>[\w\-]+)/add_page/$',
         login_required(views.AddPageView.as_view()), name='add_page'),
     url(r'^restricted/$', login_required(views.RestrictedView.as_view()),
         name='restricted' ),
     url(r'^search/$', login_required(views.PageSearchView.as_view()), 
 		name='search'),
-    url(r'^goto/$', views.TrackUrlView.as_view(), name='goto'),
+    # Served from cache; skip the ATOMIC_REQUESTS transaction
+    url(r'^goto/$', transaction.non_atomic_requests(views.TrackUrlView.as_view()),
+        name='goto'),
     url(r'^register_profile/$', login_required(views.RegisterProfile.as_view()),
         name='register_profile'),
     url(r'^profile/(?P<username>[\w\-]+)/$', views.profile, name='profile'),
     url(r'^profiles/$', views.list_profiles, name='list_profiles'),
-    url(r'^like/$', views.like_category, name='like_category'),
-    url(r'^suggest/$', views.suggest_category, name='suggest_category'),
-    url(r'^add/$', views.auto_add_page, name='auto_add_page')
+    url(r'^like/$', rate_limit(views.like_category, 1, 5), name='like_category'),
+    url(r'^suggest/$',
+        transaction.non_atomic_requests(rate_limit(views.suggest_category, 5, 20)),
+        name='suggest_category'),
+    url(r'^add/$', rate_limit(views.auto_add_page, 2, 10), name='auto_add_page'),
+    url(r'^search_results/(?P<token>[0-9a-f]{32})/$',
+        transaction.non_atomic_requests(views.search_results),
+        name='search_results'),
+    url(r'^metrics/$', views.metrics, name='metrics'),
+    # JSON API; see api.py. Read only, so outside ATOMIC_REQUESTS too.
+    url(r'^api/categories/$', transaction.non_atomic_requests(api.categories),
+        name='api_categories'),
+    url(r'^api/categories/(?P<category_name_slug>[\w\-]+)/pages/$',
+        transaction.non_atomic_requests(api.category_pages),
+        name='api_category_pages'),
+    url(r'^api/pages/$', transaction.non_atomic_requests(api.pages),
+        name='api_pages'),
+    url(r'^api/top/categories/$', transaction.non_atomic_requests(api.top_categories),
+        name='api_top_categories'),
+    url(r'^api/top/pages/$', transaction.non_atomic_requests(api.top_pages),
+        name='api_top_pages'),
+    url(r'^api/suggest/$', transaction.non_atomic_requests(api.suggest_categories),
+        name='api_suggest_categories'),
 ]
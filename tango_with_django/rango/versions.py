@@ -0,0 +1,39 @@
+import time
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'rango:version'
+
+
+def make_key(name):
+    return '{}:{}'.format(KEY_PREFIX, name)
+
+
+def initial_version():
+    # Start from the clock rather than 1, so that numbers handed out
+    # before the cache was flushed are not reused afterwards.
+    return int(time.time() * 1000)
+
+
+def get_version(name):
+    """
+    Return the current version number of a named piece of data. Cache
+    keys that embed it are invalidated together by ``bump_version``.
+    """
+    key = make_key(name)
+    version = cache.get(key)
+    if version is None:
+        version = initial_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    """Increment and return the version number of a named piece of data."""
+    key = make_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, initial_version(), timeout=None)
+        return cache.incr(key)
@@ -0,0 +1,188 @@
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from tango_with_django.rango.category_cache import category_page_cache
+from tango_with_django.rango.leaderboards import page_leaderboard
+from tango_with_django.rango.models import Page
+
+logger = logging.getLogger(__name__)
+
+
+class PageViewCounter(object):
+    """
+    Buffers page clicks in the cache and writes them to the database in
+    aggregated batches.
+
+    Each click is a single cache increment on a per-page key. The first
+    click after a flush also appends the page id to a journal so the
+    flusher knows which keys to read. Flushing reads the pending counts,
+    subtracts them from the cache atomically (so clicks that arrive
+    meanwhile are kept for the next flush) and applies them with one
+    ``UPDATE ... SET views = views + N`` per distinct N.
+    """
+    key_prefix = 'rango:pageviews'
+    journal_timeout = 60 * 60 * 24
+    lock_timeout = 60 * 5
+
+    def __init__(self, flush_interval=None):
+        self._flush_interval = flush_interval
+        self._last_flush_attempt = time.time()
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'RANGO_PAGE_VIEW_FLUSH_INTERVAL', 30)
+
+    def count_key(self, page_id):
+        return '{}:count:{}'.format(self.key_prefix, page_id)
+
+    def journal_key(self, position):
+        return '{}:journal:{}'.format(self.key_prefix, position)
+
+    @property
+    def head_key(self):
+        return '{}:journal:head'.format(self.key_prefix)
+
+    @property
+    def tail_key(self):
+        return '{}:journal:tail'.format(self.key_prefix)
+
+    @property
+    def gap_key(self):
+        return '{}:journal:gap'.format(self.key_prefix)
+
+    @property
+    def schedule_key(self):
+        return '{}:flush-due'.format(self.key_prefix)
+
+    @property
+    def lock_key(self):
+        return '{}:flush-lock'.format(self.key_prefix)
+
+    def record(self, page_id, count=1):
+        """Record ``count`` clicks on the page; no database access."""
+        page_id = int(page_id)
+        key = self.count_key(page_id)
+        cache.add(key, 0, timeout=None)
+        try:
+            pending = cache.incr(key, count)
+        except ValueError:
+            # The key was evicted between add() and incr().
+            cache.set(key, count, timeout=None)
+            pending = count
+        if pending == count:
+            self._journal(page_id)
+        self.maybe_flush()
+        return pending
+
+    def _journal(self, page_id):
+        cache.add(self.head_key, 0, timeout=None)
+        position = cache.incr(self.head_key)
+        cache.set(self.journal_key(position), page_id, self.journal_timeout)
+
+    def pending(self):
+        """Return ``{page_id: count}`` for all buffered, unflushed clicks."""
+        head = cache.get(self.head_key, 0)
+        tail = cache.get(self.tail_key, 0)
+        journal = cache.get_many(
+            [self.journal_key(i) for i in range(tail + 1, head + 1)])
+        page_ids = set(journal.values())
+        counts = cache.get_many([self.count_key(i) for i in page_ids])
+        return dict((page_id, counts[self.count_key(page_id)])
+                    for page_id in page_ids
+                    if counts.get(self.count_key(page_id)))
+
+    def maybe_flush(self):
+        """
+        Flush if the interval has elapsed. Only one process per interval
+        wins the cache lock, so a busy site issues one batch per interval.
+        """
+        interval = self.flush_interval
+        if not interval:
+            return 0
+        now = time.time()
+        if now - self._last_flush_attempt < interval:
+            return 0
+        self._last_flush_attempt = now
+        if not cache.add(self.schedule_key, 1, interval):
+            return 0
+        return self.flush()
+
+    def flush(self):
+        """
+        Write all buffered clicks to ``Page.views``/``Page.last_visit``.
+        Returns the number of clicks written.
+        """
+        if not cache.add(self.lock_key, 1, self.lock_timeout):
+            # Another process is flushing right now.
+            return 0
+        try:
+            return self._flush()
+        finally:
+            cache.delete(self.lock_key)
+
+    def _flush(self):
+        head = cache.get(self.head_key, 0)
+        tail = cache.get(self.tail_key, 0)
+        if head <= tail:
+            return 0
+        journal_keys = [self.journal_key(i) for i in range(tail + 1, head + 1)]
+        journal = cache.get_many(journal_keys)
+        first = tail + 1
+        page_ids = set()
+        for position, key in enumerate(journal_keys, first):
+            if key not in journal and position != cache.get(self.gap_key):
+                # A writer has claimed this slot but not filled it yet.
+                # Stop here and skip the slot next time if it is still
+                # empty, in case the writer died.
+                cache.set(self.gap_key, position, timeout=None)
+                break
+            page_ids.add(journal.get(key))
+            tail = position
+        page_ids.discard(None)
+        cache.set(self.tail_key, tail, timeout=None)
+        cache.delete_many(journal_keys[:tail + 1 - first])
+
+        deltas = defaultdict(list)
+        for page_id in page_ids:
+            key = self.count_key(page_id)
+            count = cache.get(key)
+            if not count:
+                continue
+            try:
+                remaining = cache.decr(key, count)
+            except ValueError:
+                continue
+            if remaining:
+                # Clicks arrived after we read the count; make sure the
+                # next flush picks them up.
+                self._journal(page_id)
+            deltas[count].append(page_id)
+
+        total = 0
+        now = timezone.now()
+        with transaction.atomic():
+            for count, ids in deltas.items():
+                Page.objects.filter(id__in=ids).update(
+                    views=F('views') + count, last_visit=now)
+                total += count * len(ids)
+        if total:
+            page_leaderboard.invalidate()
+            # Category pages list their pages by views
+            category_page_cache.invalidate(*Page.objects.filter(
+                id__in=[i for ids in deltas.values() for i in ids]).values_list(
+                    'category_id', flat=True).distinct())
+        logger.debug('Flushed %d page views for %d pages', total,
+                     sum(len(ids) for ids in deltas.values()))
+        return total
+
+
+page_view_counter = PageViewCounter()
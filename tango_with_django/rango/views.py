@@ -1,102 +1,118 @@
+import functools
+import hashlib
 import inflection
+import json
+import logging
 from datetime import datetime
 
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
 from django.shortcuts import render, redirect
 from django.http import HttpResponse, HttpResponseRedirect, HttpResponseGone
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.http import HttpResponsePermanentRedirect, Http404
 from django.contrib.auth import authenticate, login, logout
 from django.core.urlresolvers import reverse
 from django.contrib.auth.decorators import login_required
 from django.views.generic.base import TemplateView
 from django.views.generic.edit import FormView
 from django.views.generic import RedirectView
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_POST
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 
 
 from tango_with_django.users.models import User
 from tango_with_django.rango.models import Category, Page, UserProfile
 from tango_with_django.rango.forms import CategoryForm, PageForm, UserForm
-from tango_with_django.rango.forms import SearchForm, UserProfileForm
+from tango_with_django.rango.forms import SearchForm, UserProfileForm, PageItemForm
 from tango_with_django.rango.webhose_search import WebhoseMixin
-
-
-class IndexView(TemplateView):    
+from tango_with_django.rango.webhose_client import webhose_client
+from tango_with_django.rango.view_counter import page_view_counter
+from tango_with_django.rango.page_urls import page_url_cache
+from tango_with_django.rango.likes import add_like
+from tango_with_django.rango.bulk_pages import bulk_add_pages
+from tango_with_django.rango.search import get_search_backend
+from tango_with_django.rango.suggestions import category_index
+from tango_with_django.rango.leaderboards import category_leaderboard, page_leaderboard
+from tango_with_django.rango.category_cache import category_page_cache, get_category_pages
+from tango_with_django.rango import metrics as request_metrics
+from tango_with_django.rango.conditional import ConditionalGetMixin, make_etag
+from tango_with_django.rango.versions import get_version
+from tango_with_django.rango.visits import visit_counter
+from tango_with_django.rango.sidebar import category_sidebar
+
+logger = logging.getLogger(__name__)
+
+
+class IndexView(ConditionalGetMixin, TemplateView):
     template_name = "rango/index.html"
 
+    def dispatch(self, request, *args, **kwargs):
+        # Counted once per day in a signed cookie; see visits.py
+        visits, day = visit_counter.count(request)
+        self.visits = inflection.ordinalize(visits)
+        response = super(IndexView, self).dispatch(request, *args, **kwargs)
+        if day is not None:
+            visit_counter.remember(response, visits, day)
+        return response
+
+    def get_etag(self, request, *args, **kwargs):
+        # Everything the page shows: visits, both boards and the sidebar
+        return make_etag(
+            request, self.visits,
+            get_version(category_leaderboard.version_name),
+            [(c.pk, c.likes) for c in category_leaderboard.top()],
+            get_version(page_leaderboard.version_name),
+            [(p.pk, p.views) for p in page_leaderboard.top()],
+            category_sidebar.stamp())
+
     def get_context_data(self, **kwargs):
-        # Test cookie to determine brower cookie support
-        self.request.session.set_test_cookie()
-        # Helper function to handle the cookies
-        # Query db for first 5 categories with highest likes
-        category_list = Category.objects.order_by('-likes')[:5]
-        # Query db for first 5 pages with most views
-        page_list = Page.objects.order_by('-views')[:5]
+        # Most liked categories and most viewed pages, from the cache
+        category_list = category_leaderboard.top()
+        page_list = page_leaderboard.top()
         # Create proxy object for the template context
         context = super(IndexView, self).get_context_data(**kwargs)
         # Add these lists to the context
         context['categories'] = category_list
         context['pages'] = page_list
-        # Add the number of session visits to the context
-        context['visits'] = self.visitor_cookie_handler(self.request)
+        # Add the number of days visited to the context
+        context['visits'] = self.visits
 
         # Obtain response object
         return context
 
-    # Site counter helper function
-    def visitor_cookie_handler(self, request):
-        # Use the COOKIES.get() function to obtain the visits cookie.
-        # Cast the value returned to an integer or set the value to
-        # 1 if the cookie doesn't exist.
-        visits = int(self.get_server_side_cookie(request, 'visits', '1'))
-        last_visit_cookie = self.get_server_side_cookie(request, 'last_visit',
-                                                str(datetime.now()))
-        last_visit_time = datetime.strptime(last_visit_cookie[:-7],
-                                            '%Y-%m-%d %H:%M:%S')
-        # if it's been more than a day since the last visit..
-        if (datetime.now() - last_visit_time).seconds >= 86400:
-            # Update the cookie visits count & last_visit time
-            visits = visits + 1
-            request.session['last_visit'] = str(datetime.now())
-            # Set the last visit cookie
-            request.session['last_visit'] = last_visit_cookie
-            # Update/set the visits cookie
-            request.session['visits'] = visits
-        visits = inflection.ordinalize(visits)
-        return visits
-    
-    # Helper function that asks the request for a cookie
-    def get_server_side_cookie(self, request, cookie, default_val=None):
-        val = request.session.get(cookie)
-        if not val:
-            val = default_val
-        return val
-   
-
-class AboutView(TemplateView):    
+
+class AboutView(ConditionalGetMixin, TemplateView):
     template_name = "rango/about.html"
-    
+
+    def get_etag(self, request, *args, **kwargs):
+        # Static apart from the sidebar
+        return make_etag(request, category_sidebar.stamp())
+
     def get_context_data(self, **kwargs):
-        if self.request.session.test_cookie_worked():
-            print("TEST COOKIE WORKED!")
-            self.request.session.delete_test_cookie()
         # Create proxy object for the template context
         context = super(AboutView, self).get_context_data(**kwargs)
         context['my_name'] = "Altonode Networks"
         return context
     
 
-class ShowCategoryView(WebhoseMixin, TemplateView, FormView):
+class ShowCategoryView(ConditionalGetMixin, WebhoseMixin, TemplateView, FormView):
     template_name = "rango/category.html"
     model = Category, Page
     form_class = SearchForm
+
+    def get_etag(self, request, category_name_slug, **kwargs):
+        return make_etag(request, category_page_cache.stamp(category_name_slug),
+                         category_sidebar.stamp())
     
     def get_context_data(self, category_name_slug, **kwargs):
-        try:
-            category = Category.objects.get(slug=category_name_slug)
-            pages = Page.objects.filter(category=category).order_by('-views')
-        except Category.DoesNotExist:
-            category = None
-            pages = None
-        kwargs['category'] = category
-        kwargs['pages'] = pages        
+        # Category and page list from the cache; see category_cache.py
+        cached = category_page_cache.get(category_name_slug)
+        kwargs['category'] = cached.category if cached else None
+        kwargs['pages_html'] = cached.pages_html if cached else ''
         if 'form' not in kwargs:
             kwargs['form'] = self.get_form()
         return kwargs
@@ -157,6 +173,9 @@ class AddPageView(FormView, TemplateView):
     def form_valid(self, form, category_name_slug):
         page = form.save(commit=False)
         category = Category.objects.get(slug=category_name_slug)
+        if Page.objects.filter(category=category, url=page.url).exists():
+            form.add_error('url', "This page is already in the category.")
+            return self.form_invalid(form, category_name_slug)
         page.category = category
         page.first_visit = datetime.now()
         page.save()
@@ -191,33 +210,37 @@ class PageSearchView(FormView):
     form_class = SearchForm
     template_name = "rango/search.html"
 
+    @property
+    def paginate_by(self):
+        return getattr(settings, 'RANGO_SEARCH_RESULTS_PER_PAGE', 20)
+
     def get_context_data(self, query=None, **kwargs):
         context = {}
-        context['form'] = self.get_form()
+        context['form'] = kwargs.get('form') or self.get_form()
         if query:
+            try:
+                page_number = max(int(self.request.GET.get('page', 1)), 1)
+            except ValueError:
+                page_number = 1
+            # One extra result tells us whether there is a next page
+            result_list = self.get_queryset(query, page_number)
             context['query'] = query
-            context['result_list'] = self.get_queryset(query)
+            context['result_list'] = result_list[:self.paginate_by]
+            context['page_number'] = page_number
+            context['has_next'] = len(result_list) > self.paginate_by
         return context
     
-    def get_queryset(self, query):
-        page_list = Page.objects.filter(title__icontains=query)
-        queryset = []
-        for page in page_list:
-            queryset.append(page)
-        self.queryset = queryset
-
-        if self.queryset is None:
-            if self.model:
-                return self.model._default_manager.all()
-            else:
-                raise ImproperlyConfigured(
-                    "%(cls)s is missing a QuerySet. Define "
-                    "%(cls)s.model, %(cls)s.queryset, or override "
-                    "%(cls)s.get_queryset()." % {
-                        'cls': self.__class__.__name__
-                        }
-                    )
-        return queryset
+    def get_queryset(self, query, page_number=1):
+        offset = (page_number - 1) * self.paginate_by
+        return get_search_backend().search(
+            query, limit=self.paginate_by + 1, offset=offset)
+
+    def get_initial(self):
+        return {'query': self.request.GET.get('query', '')}
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('query')
+        return self.render_to_response(self.get_context_data(query=query))
                 
     def post(self, request, *args, **kwargs):
         form = self.get_form()
@@ -231,28 +254,28 @@ class TrackUrlView(RedirectView):
     def get(self, request, *args, **kwargs):
         url = None
         if 'page_id' in request.GET:
-            page_id = request.GET['page_id']
             try:
-                page = Page.objects.get(id=page_id)
-                page.views+=1
-                page.save()
-                url = page.url
-            except:
-                pass
+                page_id = int(request.GET['page_id'])
+            except ValueError:
+                page_id = None
+            if page_id:
+                url = page_url_cache.get(page_id)
+            if url:
+                # Buffered; the views column is updated in batches
+                page_view_counter.record(page_id)
         if url:
             if self.permanent:
-                return http.HttpResponsePermanentRedirect(url)
+                return HttpResponsePermanentRedirect(url)
             else:
                 return HttpResponseRedirect(url)
         else:
-            try:
-                url = self.get_redirect_url(*args, **kwargs)
-                return HttpResponseredirect(url)
-            except:
-                logger.warning(
-                    'Gone: %s', request.path,
-                    extra={'status_code':410, 'request': request}
-                )
+            url = self.get_redirect_url(*args, **kwargs)
+            if url:
+                return HttpResponseRedirect(url)
+            logger.warning(
+                'Gone: %s', request.path,
+                extra={'status_code':410, 'request': request}
+            )
             return HttpResponseGone()
         
             
@@ -293,35 +316,56 @@ def profile(request, username):
     return render(request, 'rango/profile.html',
                   {'userprofile': userprofile, 'selecteduser': user, 'form': form})
 
+def get_profiles_query(after, page_size):
+    # One more than a page, to tell whether there is a next one
+    return (UserProfile.objects.select_related('user')
+            .only('user__username', 'picture', 'derivatives')
+            .filter(user_id__gt=after).order_by('user_id')[:page_size + 1])
+
 @login_required
 def list_profiles(request):
-    userprofile_list = UserProfile.objects.all()
+    # Keyset pagination on user id: ?after=<last user id of previous page>
+    page_size = getattr(settings, 'RANGO_PROFILES_PER_PAGE', 25)
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        after = 0
+    userprofile_list = list(get_profiles_query(after, page_size))
+    next_after = None
+    if len(userprofile_list) > page_size:
+        userprofile_list = userprofile_list[:page_size]
+        next_after = userprofile_list[-1].user_id
 
     return render(request, 'rango/list_profiles.html',
-                  {'userprofile_list': userprofile_list})
+                  {'userprofile_list': userprofile_list,
+                   'next_after': next_after})
 
 @login_required
 def like_category(request):
     cat_id = None
+    likes = 0
     if request.method == "GET":
         cat_id = request.GET['category_id']
-        likes = 0
     if cat_id:
-        cat = Category.objects.get(id=int(cat_id))
-        if cat:
-            likes = cat.likes + 1
-            cat.likes = likes
-            cat.save()
+        cat_id = int(cat_id)
+        likes = add_like(cat_id)
+        if likes is None:
+            raise Http404("Category does not exist")
+        # After commit, so no cache is rebuilt from the old likes (and a
+        # rolled back like leaves them alone)
+        transaction.on_commit(functools.partial(category_index.set_likes, cat_id, likes))
+        transaction.on_commit(functools.partial(
+            category_leaderboard.update_score, cat_id, likes))
+        transaction.on_commit(functools.partial(category_page_cache.invalidate, cat_id))
+        transaction.on_commit(functools.partial(
+            category_sidebar.update_likes, cat_id, likes))
     response = "{} people like this category".format(likes)
     return HttpResponse(response)
 
 def get_category_list(max_results=0, starts_with=''):
     cat_list = []
     if starts_with:
-        cat_list = Category.objects.filter(name__istartswith=starts_with)
-    if max_results > 0:
-        if len(cat_list) > max_results:
-            cat_list = cat_list[:max_results]
+        cat_list = category_index.suggest(starts_with, max_results or None)
     return cat_list
 
 def suggest_category(request):
@@ -329,8 +373,26 @@ def suggest_category(request):
     starts_with = ''
     if request.method == 'GET':
         starts_with = request.GET['suggestion']
-    cat_list = get_category_list(8, starts_with)
-    return render(request, 'rango/cats.html', {'cats': cat_list})
+    # One extra tells whether these are all the matches, in which case
+    # rango-ajax.js filters them itself for longer prefixes.
+    cat_list = get_category_list(9, starts_with)
+    complete = len(cat_list) <= 8
+    cat_list = cat_list[:8]
+    if request.GET.get('format') == 'json':
+        response = JsonResponse({
+            'prefix': starts_with,
+            'complete': complete,
+            'results': [{'name': c.name, 'slug': c.slug,
+                         'url': reverse('rango:show_category', args=[c.slug])}
+                        for c in cat_list],
+        })
+    else:
+        response = render(request, 'rango/cats.html', {'cats': cat_list})
+    # The same for everyone, so browsers and proxies may keep it a while
+    patch_cache_control(response, public=True,
+                        max_age=getattr(settings, 'RANGO_SUGGEST_MAX_AGE', 60))
+    response['ETag'] = quote_etag(hashlib.md5(response.content).hexdigest())
+    return get_conditional_response(request, etag=response['ETag'], response=response)
 
 @login_required
 def auto_add_page(request):
@@ -344,9 +406,69 @@ def auto_add_page(request):
         title = request.GET['title']
         if cat_id:
             category = Category.objects.get(id=int(cat_id))
-            p = Page.objects.get_or_create(category=category,
-                                           title=title, url=url)
-            pages = Page.objects.filter(category=category).order_by('-views')
+            bulk_add_pages(category, [(title, url)])
+            pages, next_cursor = get_category_pages(category)
             # Adds our results list to the template context under name pages.
+            context_dict['category'] = category
             context_dict['pages'] = pages
+            context_dict['next_cursor'] = next_cursor
     return render(request, 'rango/page_list.html', context_dict)
+
+@login_required
+@require_POST
+def add_pages(request, category_name_slug):
+    # Adds a batch of web search results to the category and returns the
+    # list items of the pages that were new.
+    try:
+        category = Category.objects.get(slug=category_name_slug)
+    except Category.DoesNotExist:
+        raise Http404("Category does not exist")
+    try:
+        items = json.loads(request.body.decode('utf-8'))['pages']
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest('Expected {"pages": [{"title": ..., "url": ...}]}')
+    limit = getattr(settings, 'RANGO_ADD_PAGES_MAX', 100)
+    if not isinstance(items, list) or len(items) > limit:
+        return HttpResponseBadRequest('Expected a list of at most {} pages'.format(limit))
+    forms = [PageItemForm(item if isinstance(item, dict) else {}) for item in items]
+    for i, form in enumerate(forms):
+        if not form.is_valid():
+            return HttpResponseBadRequest('Page {}: {}'.format(i, form.errors.as_text()))
+    pages = bulk_add_pages(category, [(form.cleaned_data['title'], form.cleaned_data['url'])
+                                      for form in forms])
+    return render(request, 'rango/page_items.html', {'pages': pages})
+
+def category_pages(request, category_name_slug):
+    # The next page of a category's pages for the "Load more" button
+    try:
+        category = Category.objects.get(slug=category_name_slug)
+        pages, next_cursor = get_category_pages(category, request.GET.get('after'))
+    except (Category.DoesNotExist, ValueError):
+        raise Http404("Category does not exist")
+    return render(request, 'rango/page_list.html',
+                  {'category': category, 'pages': pages,
+                   'next_cursor': next_cursor, 'more': True})
+
+def search_results(request, token):
+    # Polled by rango-ajax.js while a background web search runs
+    search_list = webhose_client.poll(token)
+    if search_list is None:
+        raise Http404("Unknown search")
+    if search_list == webhose_client.PENDING:
+        return HttpResponse(status=202)
+    if search_list == webhose_client.FAILED:
+        return HttpResponse('The web search failed. Please try again in a moment.',
+                            status=502, content_type='text/plain')
+    return render(request, 'rango/search_results.html',
+                  {'search_list': search_list,
+                   'category_id': request.GET.get('category_id')})
+
+def metrics(request):
+    # Request metrics for Prometheus; staff or the RANGO_METRICS_TOKEN only
+    token = getattr(settings, 'RANGO_METRICS_TOKEN', None)
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not request.user.is_staff and not (
+            token and constant_time_compare(authorization, 'Bearer ' + token)):
+        raise PermissionDenied
+    return HttpResponse(request_metrics.registry.prometheus(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
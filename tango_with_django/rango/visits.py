@@ -0,0 +1,48 @@
+from django.utils import timezone
+
+
+def today():
+    """Today's date as a day number (the proleptic Gregorian ordinal)."""
+    return timezone.localdate().toordinal()
+
+
+class VisitCounter(object):
+    """
+    Counts the days a browser has visited the index page, in a signed
+    cookie holding ``<visits>:<day of the last visit>``. The cookie is
+    only written on the first visit of a day, so other requests neither
+    touch the session nor set a cookie.
+    """
+    cookie_name = 'rango_visits'
+    salt = 'rango.visits'
+    max_age = 60 * 60 * 24 * 365
+
+    def read(self, request):
+        """Return the visits and the day of the last one, (0, None) for none."""
+        value = request.get_signed_cookie(self.cookie_name, None, salt=self.salt,
+                                          max_age=self.max_age)
+        if value is None:
+            return 0, None
+        try:
+            visits, day = value.split(':')
+            return int(visits), int(day)
+        except ValueError:
+            return 0, None
+
+    def count(self, request):
+        """
+        Count this visit. Return the visits so far and, if the cookie
+        needs writing, the day to write into it (else None).
+        """
+        visits, last_day = self.read(request)
+        day = today()
+        if last_day is not None and last_day >= day:
+            return visits, None
+        return visits + 1, day
+
+    def remember(self, response, visits, day):
+        response.set_signed_cookie(self.cookie_name, '{}:{}'.format(visits, day),
+                                   salt=self.salt, max_age=self.max_age, httponly=True)
+
+
+visit_counter = VisitCounter()
@@ -0,0 +1,268 @@
+import hashlib
+import http.client
+import json
+import logging
+import queue
+import socket
+import threading
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class WebhoseError(Exception):
+    pass
+
+
+class _Call(object):
+    """An in-flight upstream request that other threads can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WebhoseClient(object):
+    """
+    Client for the Webhose filterWebContent API.
+
+    - the API key is read once (WEBHOSE_API_KEY setting, else search.key)
+    - HTTP connections are kept alive and reused from a small pool
+    - every request has a connect/read timeout
+    - results are cached per normalised query
+    - concurrent identical queries share one upstream request
+    """
+    key_prefix = 'rango:webhose'
+    PENDING = 'pending'
+    FAILED = 'failed'
+
+    def __init__(self, root_url=None, api_key=None, key_file='search.key',
+                 timeout=None, cache_timeout=None, pool_size=4):
+        self._root_url = root_url
+        self._api_key = api_key
+        self.key_file = key_file
+        self._timeout = timeout
+        self._cache_timeout = cache_timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._executor = None
+
+    @property
+    def root_url(self):
+        return self._root_url or getattr(
+            settings, 'RANGO_WEBHOSE_URL', 'http://webhose.io/filterWebContent')
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return getattr(settings, 'RANGO_WEBHOSE_TIMEOUT', 5)
+
+    @property
+    def cache_timeout(self):
+        if self._cache_timeout is not None:
+            return self._cache_timeout
+        return getattr(settings, 'RANGO_WEBHOSE_CACHE_TIMEOUT', 60 * 10)
+
+    @property
+    def job_timeout(self):
+        # How long a submitted search may stay pending, and how long a
+        # failed one is reported before it can be submitted again
+        return getattr(settings, 'RANGO_WEBHOSE_JOB_TIMEOUT', 30)
+
+    @property
+    def api_key(self):
+        if self._api_key is None:
+            api_key = getattr(settings, 'WEBHOSE_API_KEY', None)
+            if not api_key:
+                try:
+                    with open(self.key_file, 'r') as f:
+                        api_key = f.readline().strip()
+                except (IOError, OSError):
+                    raise IOError('Search key file not found')
+            if not api_key:
+                raise KeyError('Webhose key not found')
+            self._api_key = api_key
+        return self._api_key
+
+    @staticmethod
+    def normalize(search_terms):
+        return ' '.join(search_terms.lower().split())
+
+    def make_token(self, query, size):
+        return hashlib.md5('{}:{}'.format(size, query).encode('utf-8')).hexdigest()
+
+    def make_key(self, token):
+        return '{}:results:{}'.format(self.key_prefix, token)
+
+    def job_key(self, job_id):
+        return '{}:job:{}'.format(self.key_prefix, job_id)
+
+    def run_key(self, token):
+        return '{}:run:{}'.format(self.key_prefix, token)
+
+    def search(self, search_terms, size=8):
+        """
+        Return up to ``size`` results for the query as dictionaries with
+        ``title``, ``link`` and ``summary`` keys. Upstream failures are
+        logged and give an empty list, which is not cached.
+        """
+        try:
+            return self._search(self.normalize(search_terms), size)
+        except WebhoseError as e:
+            logger.warning('Error when querying the Webhose API: %s', e)
+            return []
+
+    def _search(self, query, size):
+        """``search`` for a normalised query; failures raise WebhoseError."""
+        if not query:
+            return []
+        key = self.make_key(self.make_token(query, size))
+        results = cache.get(key)
+        if results is not None:
+            return results
+        results = self._coalesce(key, lambda: self.fetch(query, size))
+        cache.set(key, results, self.cache_timeout)
+        return results
+
+    def submit(self, search_terms, size=8):
+        """
+        Run the search on the background worker pool and return a job id
+        for ``poll``. Any process sharing the cache can poll for the
+        results. Job ids are random, so only whoever submitted the search
+        can poll for it; identical searches still share one upstream run.
+        """
+        query = self.normalize(search_terms)
+        token = self.make_token(query, size)
+        job_id = uuid.uuid4().hex
+        cache.set(self.job_key(job_id), token, self.cache_timeout)
+        run_key = self.run_key(token)
+        if cache.get(self.make_key(token)) is None and \
+                cache.add(run_key, self.PENDING, self.job_timeout):
+            self.get_executor().submit(self._run_job, query, size, run_key)
+        return job_id
+
+    def _run_job(self, query, size, run_key):
+        try:
+            results = self._search(query, size)
+        except WebhoseError as e:
+            logger.warning('Error when querying the Webhose API: %s', e)
+            cache.set(run_key, self.FAILED, self.job_timeout)
+        except Exception:
+            logger.exception('Background Webhose search failed')
+            cache.set(run_key, self.FAILED, self.job_timeout)
+        else:
+            cache.set(run_key, results, self.cache_timeout)
+
+    def poll(self, job_id):
+        """
+        Return the results of a submitted search, ``PENDING`` while it is
+        still running, ``FAILED`` if it failed recently, or None if the
+        job id is unknown (or its job was lost).
+        """
+        token = cache.get(self.job_key(job_id))
+        if token is None:
+            return None
+        results = cache.get(self.make_key(token))
+        if results is None:
+            results = cache.get(self.run_key(token))
+        return results
+
+    def get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'RANGO_SEARCH_WORKERS', 4))
+            return self._executor
+
+    def _coalesce(self, key, fetch):
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+        if not leader:
+            if not call.done.wait(self.timeout * 2):
+                raise WebhoseError('timed out waiting for a shared request')
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fetch()
+        except Exception as e:
+            # Whatever went wrong, the waiting threads must not take the
+            # missing result for one
+            call.error = e if isinstance(e, WebhoseError) else WebhoseError(
+                'shared request failed: {!r}'.format(e))
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+    def build_path(self, query, size):
+        parts = urllib.parse.urlsplit(self.root_url)
+        return ('{path}?token={key}&format=json&'
+                'ts=1505823665729&sort=crawled&size={size}&'
+                'q=language%3Aenglish%20{query}').format(
+                    path=parts.path or '/', key=self.api_key, size=size,
+                    query=urllib.parse.quote(query))
+
+    def fetch(self, query, size):
+        path = self.build_path(query, size)
+        body = self._get(path)
+        try:
+            posts = json.loads(body.decode('utf-8'))['posts']
+            # Restrict the summary to the first 222 characters
+            return [{'title': post['title'],
+                     'link': post['url'],
+                     'summary': post['text'][:222]} for post in posts]
+        except (ValueError, KeyError, TypeError) as e:
+            raise WebhoseError('bad response: {!r}'.format(e))
+
+    def _new_connection(self):
+        parts = urllib.parse.urlsplit(self.root_url)
+        if parts.scheme == 'https':
+            return http.client.HTTPSConnection(
+                parts.hostname, parts.port, timeout=self.timeout)
+        return http.client.HTTPConnection(
+            parts.hostname, parts.port, timeout=self.timeout)
+
+    def _get(self, path):
+        # A pooled connection may have been closed by the server while
+        # idle, so retry once on a fresh one.
+        for attempt in range(2):
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                connection = self._new_connection()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                if attempt or isinstance(e, socket.timeout):
+                    raise WebhoseError(str(e) or e.__class__.__name__)
+                continue
+            if response.will_close:
+                connection.close()
+            else:
+                try:
+                    self._pool.put_nowait(connection)
+                except queue.Full:
+                    connection.close()
+            if response.status != 200:
+                raise WebhoseError('HTTP {}'.format(response.status))
+            return body
+
+
+webhose_client = WebhoseClient()
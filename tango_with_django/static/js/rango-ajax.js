@@ -7,23 +7,144 @@ $('#likes').click(function(){
 	});
 });
 
+// Category suggestions. Answers are kept per prefix; when one holds
+// every match ("complete"), longer prefixes are answered by filtering it
+// here. Otherwise the server is asked once typing pauses.
+var suggestions = {};
+
+function cachedSuggestions(prefix){
+	for (var i = prefix.length; i > 0; i--) {
+		var entry = suggestions[prefix.slice(0, i)];
+		if (entry && (i == prefix.length || entry.complete)) {
+			return $.grep(entry.results, function(c){
+				return c.name.toLowerCase().indexOf(prefix) === 0;
+			});
+		}
+	}
+	return null;
+}
+
+function showSuggestions(results){
+	var list = $('<ul>');
+	$.each(results, function(i, c){
+		list.append($('<li>').append($('<a>').attr('href', c.url).text(c.name)));
+	});
+	if (!results.length) {
+		list.append($('<li>').append(
+			$('<strong>').text('No categories present for that search.')));
+	}
+	$('#cats').empty().append(list);
+}
+
 $(document).ready(function(){
+	var cats = $('#cats');
+	var sidebar = cats.html();
+	var timer = null;
 	$('#suggestion').keyup(function(){
-		var query;
-		query = $(this).val();
-		$.get('/rango/suggest/', {suggestion: query}, function(data){
-			$('#cats').html(data);
-		});});
+		var prefix = $.trim($(this).val()).toLowerCase();
+		var input = $(this);
+		clearTimeout(timer);
+		if (!prefix) {
+			cats.html(sidebar);
+			return;
+		}
+		var results = cachedSuggestions(prefix);
+		if (results) {
+			showSuggestions(results);
+			return;
+		}
+		timer = setTimeout(function(){
+			$.getJSON('/rango/suggest/', {suggestion: prefix, format: 'json'}, function(data){
+				suggestions[prefix] = data;
+				// Skip answers overtaken by more typing
+				if ($.trim(input.val()).toLowerCase() == prefix) {
+					showSuggestions(data.results);
+				}
+			});
+		}, 250);
+	});
+});
+
+// Delegated, so it also works for results loaded by the poller below.
+// Clicks within a moment of each other are sent as one batch.
+var pendingPages = [];
+var pendingButtons = [];
+$(document).on('click', 'button.rango-add', function(){
+	var me = $(this);
+	me.prop('disabled', true);
+	pendingPages.push({title: me.attr('data-title'), url: me.attr('data-url')});
+	pendingButtons.push(me);
+	if (pendingPages.length == 1) {
+		setTimeout(addPendingPages, 200);
+	}
 });
 
-$('.rango-add').click(function(){
-	var catid = $(this).attr("data-catid");
-	var url = $(this).attr("data-url");
-	var title = $(this).attr("data-title");
-	var me = $(this)
-	$.get('/rango/add/',
-		{category_id: catid, url: url, title: title}, function(data){
-			$('#pages').html(data);
-			me.hide();
-		});
+$(document).on('click', 'button.rango-add-all', function(){
+	$('button.rango-add:enabled').click();
+	$(this).hide();
+});
+
+function addPendingPages(){
+	var pages = $('#pages');
+	var buttons = pendingButtons;
+	var body = JSON.stringify({pages: pendingPages});
+	pendingPages = [];
+	pendingButtons = [];
+	$.ajax({
+		url: pages.attr('data-add-url'), type: 'POST', data: body,
+		contentType: 'application/json',
+		headers: {'X-CSRFToken': $('[name=csrfmiddlewaretoken]').val()}
+	}).done(function(data){
+		$.each(buttons, function(i, button){ button.hide(); });
+		if (pages.find('button.rango-more').length) {
+			// New pages have no views yet, so "Load more" reaches them
+			return;
+		}
+		var list = pages.find('ul').last();
+		if (list.length) {
+			list.append(data);
+		} else if ($.trim(data)) {
+			pages.html($('<ul>').append(data));
+		}
+	}).fail(function(){
+		$.each(buttons, function(i, button){ button.prop('disabled', false); });
+	});
+}
+
+// Replace the "Load more" button with the next pages of the category
+$(document).on('click', 'button.rango-more', function(){
+	var me = $(this);
+	me.prop('disabled', true);
+	$.get(me.attr('data-url'), function(data){
+		me.replaceWith(data);
 	});
+});
+
+$(document).ready(function(){
+	var results = $('#search_results');
+	var pollUrl = results.attr('data-poll-url');
+	var delay = 250;
+	// The server gives up on a search after RANGO_WEBHOSE_JOB_TIMEOUT;
+	// stop waiting a while after that
+	var deadline = Date.now() + 60000;
+	function failed(){
+		results.empty().append(
+			$('<p>').text('The web search failed. Please try again in a moment.'));
+	}
+	function poll(){
+		$.ajax({url: pollUrl, cache: false}).done(function(data, status, xhr){
+			if (xhr.status != 202) {
+				results.html(data);
+			} else if (Date.now() < deadline) {
+				// Still searching; back off up to two seconds
+				delay = Math.min(delay * 2, 2000);
+				setTimeout(poll, delay);
+			} else {
+				failed();
+			}
+		}).fail(failed);
+	}
+	if (pollUrl) {
+		setTimeout(poll, delay);
+	}
+});